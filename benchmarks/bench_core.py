@@ -0,0 +1,196 @@
+"""Time the core tree operations on synthetic forests.
+
+Run from the repository root:
+
+    python benchmarks/bench_core.py [--sizes 1000 10000 100000]
+                                    [--shapes wide deep conveyed]
+                                    [--repeat 20] [-o bench_core.json]
+
+This is a model-only benchmark: it drives ShareLedger and the storage
+functions the tab calls, so it needs no display. Each GUI action is timed
+through the ledger call behind it (add_heir for Add Heir, edit for an
+Edit that rescales the children, convey, delete of an original owner,
+total_share for the status bar, claimants for the report, save/load in
+both file formats, and undo of every mutation). Results go to a JSON file
+so runs can be compared over time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import ShareLedger
+from rational import exact_sum
+from storage import load_ledger, save_ledger
+
+
+def build_rows(parents, fractions, owners):
+    """Turn parent indexes and relative fractions into restore_rows()
+    tuples with absolute shares. Parents must come before children."""
+    shares = []
+    rows = []
+    for i, (parent, fraction) in enumerate(zip(parents, fractions)):
+        if parent is None:
+            share = Fraction(1, owners)
+            parent_id = ShareLedger.ROOT
+        else:
+            share = shares[parent] * fraction
+            parent_id = f"N{parent}"
+        shares.append(share)
+        rows.append((f"N{i}", parent_id, f"Person {i}", share, share))
+    return rows
+
+
+def wide_forest(n, rnd):
+    # Four owners, every person split evenly among twelve heirs.
+    owners, branching = 4, 12
+    parents = [None] * owners + [(i - owners) // branching for i in range(owners, n)]
+    fractions = [None] * owners + [Fraction(1, branching)] * (n - owners)
+    return ShareLedger.from_rows(build_rows(parents, fractions, owners))
+
+
+def deep_forest(n, rnd):
+    # Ten generational chains; every 25th generation keeps half and
+    # passes half on, so denominators grow as in long-held tracts.
+    owners = 10
+    parents = [None] * owners + [i - owners for i in range(owners, n)]
+    fractions = [None] * owners + [
+        Fraction(1, 2) if (i // owners) % 25 == 0 else Fraction(1) for i in range(owners, n)
+    ]
+    return ShareLedger.from_rows(build_rows(parents, fractions, owners))
+
+
+def conveyed_forest(n, rnd):
+    # A random forest of thirds, then one conveyance per twenty people,
+    # each moving half of a leaf's share to someone anywhere in the tree.
+    owners = 5
+    parents = [None] * owners + [rnd.randrange(i) for i in range(owners, n)]
+    fractions = [None] * owners + [Fraction(1, 3)] * (n - owners)
+    ledger = ShareLedger.from_rows(build_rows(parents, fractions, owners))
+    ids = list(ledger.nodes)[1:]
+    leaves = [item for item in ids if not ledger.children(item)]
+    for _ in range(n // 20):
+        source = rnd.choice(leaves)
+        remainder = ledger.remainder(source)
+        if remainder > 0:
+            ledger.convey(source, [(rnd.choice(ids), remainder / 2)])
+    ledger.history.clear()
+    return ledger
+
+
+SHAPES = {"wide": wide_forest, "deep": deep_forest, "conveyed": conveyed_forest}
+
+
+def timed(samples, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def run_shape(shape, n, repeat, rnd, directory):
+    samples = {}
+
+    def sample(name):
+        return samples.setdefault(name, [])
+
+    start = time.perf_counter()
+    ledger = SHAPES[shape](n, rnd)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    ids = list(ledger.nodes)[1:]
+    parents = [item for item in ids if ledger.children(item) and ledger.share(item)]
+    leaves = [item for item in ids if not ledger.children(item) and ledger.remainder(item) > 0]
+
+    for _ in range(repeat):
+        timed(sample("add_heir"), ledger.add_heir, rnd.choice(ids), "New heir", Fraction(1, 2))
+        timed(sample("undo"), ledger.undo)
+
+        item = rnd.choice(parents)
+        timed(sample("edit_rescale"), ledger.edit, item, ledger.name(item), ledger.relative_share(item) / 2)
+        timed(sample("undo"), ledger.undo)
+
+        if leaves:
+            source = rnd.choice(leaves)
+            timed(sample("convey"), ledger.convey, source, [(rnd.choice(ids), ledger.remainder(source) / 2)])
+            timed(sample("undo"), ledger.undo)
+
+        timed(sample("delete_owner"), ledger.delete, rnd.choice(ledger.original_owners()))
+        timed(sample("undo"), ledger.undo)
+
+        timed(sample("total_shares"), lambda: (ledger.total_share(), len(ledger)))
+
+    for _ in range(max(1, repeat // 5)):
+        timed(sample("report"), lambda: exact_sum(share for _, share in ledger.claimants()))
+        for extension in ("json", "vest"):
+            path = os.path.join(directory, f"{shape}-{n}.{extension}")
+            timed(sample(f"save_{extension}"), lambda: save_ledger(path, list(ledger.records())))
+            timed(sample(f"load_{extension}"), load_ledger, path)
+
+    # A what-if with one edit, compared with the tree it was forked from.
+    timed(sample("hash_tree"), ledger.subtree_hash)
+    for _ in range(repeat):
+        fork = ledger.fork()
+        item = rnd.choice(parents)
+        fork.edit(item, ledger.name(item), ledger.relative_share(item) / 2)
+        timed(sample("diff_after_edit"), fork.diff, ledger)
+
+    results = [{"shape": shape, "nodes": n, "operation": "build", "runs": 1,
+                "mean_ms": build_ms, "median_ms": build_ms, "min_ms": build_ms, "max_ms": build_ms}]
+    for name, values in samples.items():
+        results.append({
+            "shape": shape,
+            "nodes": n,
+            "operation": name,
+            "runs": len(values),
+            "mean_ms": statistics.fmean(values),
+            "median_ms": statistics.median(values),
+            "min_ms": min(values),
+            "max_ms": max(values),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES), default=list(SHAPES))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="bench_core.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.sizes:
+            for shape in args.shapes:
+                rows = run_shape(shape, n, args.repeat, random.Random(args.seed), directory)
+                for row in rows:
+                    print(f"{shape:<9}{n:>8} {row['operation']:<14}{row['median_ms']:>12.3f} ms"
+                          f"  (mean {row['mean_ms']:.3f}, {row['runs']} runs)")
+                results.extend(rows)
+
+    report = {
+        "benchmark": "core",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
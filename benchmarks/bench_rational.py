@@ -0,0 +1,93 @@
+"""Compare the rational helpers in rational.py with plain Fraction arithmetic.
+
+Run from the repository root:
+
+    python benchmarks/bench_rational.py [--nodes 20000] [--repeat 5]
+
+The workload is a deep conveyance chain in which every heir takes 1/3,
+1/7 or 1/11 of a recent node, so denominators grow as they do in real
+tracts that have been divided for generations.
+"""
+import argparse
+import functools
+import operator
+import os
+import random
+import sys
+import timeit
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import ShareLedger
+from rational import exact_sum, product
+
+
+def build_rows(nodes, seed):
+    rnd = random.Random(seed)
+    rows = [("N0", "", "Owner", Fraction(1), Fraction(1))]
+    shares = [Fraction(1)]
+    chains = [[]]
+    for i in range(1, nodes):
+        parent = rnd.randrange(max(0, i - 50), i)
+        fraction = Fraction(1, rnd.choice((3, 7, 11)))
+        shares.append(shares[parent] * fraction)
+        chains.append(chains[parent] + [fraction])
+        rows.append((f"N{i}", f"N{parent}", f"Heir {rnd.randrange(1000)}", shares[i], shares[i]))
+    return rows, chains
+
+
+def fraction_rebuild(ledger, node_id=ShareLedger.ROOT):
+    # The totals rebuild as it was written with Fraction sums.
+    node = ledger.nodes[node_id]
+    child_alloc = Fraction(0)
+    child_total = Fraction(0)
+    for child in node.children:
+        fraction_rebuild(ledger, child)
+        child_node = ledger.nodes[child]
+        child_alloc += child_node.allocated
+        child_total += child_node.total
+    node.child_alloc = child_alloc
+    node.child_total = child_total
+    node.total = node.claim() + node.scale * child_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows, chains = build_rows(args.nodes, args.seed)
+    ledger = ShareLedger.from_rows(rows)
+    claims = [share for _, share in ledger.claimants()]
+    longest = max(chains, key=len)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * len(longest) + 100))
+
+    assert sum(claims) == exact_sum(claims)
+    assert functools.reduce(operator.mul, longest, Fraction(1)) == product(longest)
+
+    cases = [
+        ("sum of claimant shares",
+         lambda: sum(claims, Fraction(0)),
+         lambda: exact_sum(claims)),
+        ("products along every chain",
+         lambda: [functools.reduce(operator.mul, chain, Fraction(1)) for chain in chains],
+         lambda: [product(chain) for chain in chains]),
+        ("totals rebuild",
+         lambda: fraction_rebuild(ledger),
+         lambda: ledger._rebuild_totals()),
+    ]
+
+    print(f"{args.nodes} nodes, deepest chain {len(longest)}, "
+          f"largest denominator {max(len(str(share.denominator)) for share in claims)} digits")
+    print(f"{'case':<28}{'Fraction (s)':>14}{'rational (s)':>14}{'speedup':>10}")
+    for name, baseline, candidate in cases:
+        before = min(timeit.repeat(baseline, number=1, repeat=args.repeat))
+        after = min(timeit.repeat(candidate, number=1, repeat=args.repeat))
+        print(f"{name:<28}{before:>14.4f}{after:>14.4f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Time cold starts of the application's entry points against a budget.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeat 10] [-o bench_startup.json]
+
+Each case starts a fresh interpreter, so the times include Python's own
+start-up. The engine and command line cases must also finish without
+importing tkinter. The window case opens the main window and closes it
+once it has been drawn; it is skipped where Tk cannot open a display.
+The script exits with status 1 if any median is over its budget.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NO_TK = "sys.exit('tkinter' in sys.modules and 'tkinter was imported')"
+
+ENGINE = "import sys\nimport ledger, rational, search, storage\n" + NO_TK
+
+COMMAND_LINE = """import contextlib, io, sys
+import main
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        main.main(["report", "--help"])
+    except SystemExit:
+        pass
+""" + NO_TK
+
+WINDOW = "import tkinter as tk, gui\nroot = tk.Tk()\ngui.HeirloomApp(root)\nroot.update()\nroot.destroy()"
+
+# (name, arguments to python, budget in ms)
+CASES = [
+    ("python", ["-c", "pass"], 100),
+    ("engine import", ["-c", ENGINE], 200),
+    ("command line", ["-c", COMMAND_LINE], 300),
+    ("gui import", ["-c", "import gui"], 400),
+    ("gui window", ["-c", WINDOW], 1500),
+]
+
+
+def run_case(arguments, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *arguments], cwd=ROOT, capture_output=True, text=True)
+        samples.append((time.perf_counter() - start) * 1000)
+        if result.returncode:
+            return None, (result.stderr.strip().splitlines() or [f"exit status {result.returncode}"])[-1]
+    return samples, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("-o", "--output", default="bench_startup.json")
+    args = parser.parse_args()
+
+    results = []
+    over = 0
+    for name, arguments, budget in CASES:
+        samples, error = run_case(arguments, args.repeat)
+        if samples is None:
+            print(f"{name:<16}{'skipped':>12}  ({error})")
+            results.append({"case": name, "budget_ms": budget, "skipped": error})
+            continue
+        median = statistics.median(samples)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        over += median > budget
+        print(f"{name:<16}{median:>9.1f} ms  (min {min(samples):.1f}, budget {budget}) {status}")
+        results.append({
+            "case": name,
+            "budget_ms": budget,
+            "runs": len(samples),
+            "median_ms": median,
+            "min_ms": min(samples),
+            "max_ms": max(samples),
+        })
+
+    report = {
+        "benchmark": "startup",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Wrote {len(results)} results to {args.output}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
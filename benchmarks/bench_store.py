@@ -0,0 +1,118 @@
+"""Time the SQLite tree store against whole-file saves.
+
+Run from the repository root:
+
+    python benchmarks/bench_store.py [--sizes 10000 100000] [--repeat 20]
+                                     [-o bench_store.json]
+
+For each size a wide tree is saved once to a store file. The script then
+times opening it, which reads only the top of the tree, and opening an
+original owner's branch. It also times an edit followed by the
+incremental save, which writes the rows on the edited node's path. The
+same edit followed by a full .vest save is timed for comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_core import wide_forest
+from storage import save_ledger
+from store import TreeStore
+
+
+def timed(samples, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def run_size(n, repeat, rnd, directory):
+    samples = {}
+
+    def sample(name):
+        return samples.setdefault(name, [])
+
+    ledger = wide_forest(n, rnd)
+    path = os.path.join(directory, f"wide-{n}.vestdb")
+    store = TreeStore(path)
+    timed(sample("first_save"), store.save, "tree", ledger)
+    store.close()
+
+    for _ in range(repeat):
+        store = TreeStore(path)
+        opened = timed(sample("open"), store.open, "tree")
+        owner = opened.original_owners()[0]
+        timed(sample("expand"), lambda: list(opened.child_shares(owner)))
+        store.close()
+
+    store = TreeStore(path)
+    opened = store.open("tree")
+    ids = list(ledger.nodes)[1:]
+    vest = os.path.join(directory, f"wide-{n}.vest")
+    for _ in range(repeat):
+        item = rnd.choice(ids)
+        # The same edit in both, so each save has the same change to write.
+        fraction = Fraction(1, rnd.randint(2, 40))
+        opened.edit(item, "Edited", fraction)
+        ledger.edit(item, "Edited", fraction)
+        timed(sample("edit_incremental_save"), store.save, "tree", opened)
+        timed(sample("edit_full_vest_save"), lambda: save_ledger(vest, list(ledger.records())))
+    store.close()
+
+    results = []
+    for name, values in samples.items():
+        results.append({
+            "nodes": n,
+            "operation": name,
+            "runs": len(values),
+            "mean_ms": statistics.fmean(values),
+            "median_ms": statistics.median(values),
+            "min_ms": min(values),
+            "max_ms": max(values),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="bench_store.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.sizes:
+            rows = run_size(n, args.repeat, random.Random(args.seed), directory)
+            for row in rows:
+                print(f"{n:>8} {row['operation']:<24}{row['median_ms']:>12.3f} ms"
+                      f"  (mean {row['mean_ms']:.3f}, {row['runs']} runs)")
+            results.extend(rows)
+
+    report = {
+        "benchmark": "store",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from fractions import Fraction
+
+from consolidate import ClaimantCache, consolidate, file_digest
+from storage import TREE_EXTENSIONS, load_ledger
+
+
+def expand_paths(patterns):
+    # Windows shells do not expand wildcards, so do it here for everyone.
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+                if name.lower().endswith(TREE_EXTENSIONS) and ".autosave." not in name
+            ))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+    return paths
+
+
+def report_tract(path):
+    """Compute one tract's claimants in a worker process.
+
+    Returns (path, rows, total, error), with rows as (name, share,
+    percentage) strings so the parent process only has to write them.
+    """
+    try:
+        ledger = load_ledger(path)
+    except Exception as e:
+        return path, [], None, f"{type(e).__name__}: {e}"
+    rows = [
+        (name, str(share), f"{float(share) * 100:.8f}")
+        for name, share in ledger.iter_claimants()
+        if share != 0
+    ]
+    total_share = ledger.total_share()
+    return path, rows, (str(total_share), f"{float(total_share) * 100:.8f}"), None
+
+
+def iter_reports(paths, jobs):
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield report_tract(path)
+        return
+    # Loading the process pool costs more than a small report takes.
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(report_tract, paths, chunksize=chunksize)
+
+
+def write_csv(out, reports):
+    writer = csv.writer(out)
+    writer.writerow(["tract", "claimant", "share", "percentage"])
+    for path, rows, total, error in reports:
+        if error is None:
+            tract = os.path.splitext(os.path.basename(path))[0]
+            writer.writerows((tract, name, share, percentage) for name, share, percentage in rows)
+        yield path, error
+
+
+def write_text(out, reports):
+    for path, rows, total, error in reports:
+        if error is None:
+            out.write(f"{os.path.splitext(os.path.basename(path))[0]}\n\n")
+            for name, share, percentage in rows:
+                out.write(f"{name}: {share} ({percentage}%)\n")
+            out.write(f"\nTotal Shares: {total[0]} ({total[1]}%)\n\n")
+        yield path, error
+
+
+def write_json(out, reports):
+    # One JSON list, written a tract at a time.
+    out.write("[")
+    first = True
+    for path, rows, total, error in reports:
+        if error is None:
+            entry = {
+                "tract": os.path.splitext(os.path.basename(path))[0],
+                "path": path,
+                "claimants": [{"name": name, "share": share, "percentage": percentage} for name, share, percentage in rows],
+                "total_share": total[0],
+                "total_percentage": total[1],
+            }
+            out.write(("\n" if first else ",\n") + json.dumps(entry))
+            first = False
+        yield path, error
+    out.write("\n]\n")
+
+
+def write_jsonl(out, reports):
+    # One claimant per line, so readers can start on a tract before the
+    # next is done.
+    for path, rows, total, error in reports:
+        if error is None:
+            tract = os.path.splitext(os.path.basename(path))[0]
+            for name, share, percentage in rows:
+                out.write(json.dumps({"tract": tract, "claimant": name, "share": share, "percentage": percentage}) + "\n")
+        yield path, error
+
+
+WRITERS = {"csv": write_csv, "txt": write_text, "json": write_json, "jsonl": write_jsonl}
+
+
+def report_command(args):
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No tree files matched.", file=sys.stderr)
+        return 2
+
+    jobs = args.jobs or os.cpu_count() or 1
+    out = sys.stdout if args.output == "-" else open(args.output, 'w', newline="", encoding="utf-8")
+    failed = 0
+    try:
+        for path, error in WRITERS[args.format](out, iter_reports(paths, jobs)):
+            if error is not None:
+                failed += 1
+                print(f"{path}: {error}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Reported {len(paths) - failed} of {len(paths)} tracts.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def parse_tract(spec):
+    # PATH=ACRES; split at the last "=" so paths may contain one.
+    path, sep, acres = spec.rpartition("=")
+    try:
+        acres = Fraction(acres)
+    except (ValueError, ZeroDivisionError):
+        acres = None
+    if not sep or not path or acres is None or acres < 0:
+        raise argparse.ArgumentTypeError(f"expected PATH=NET_ACRES, got {spec!r}")
+    return path, acres
+
+
+def write_consolidated_csv(out, rows, unit_acres):
+    writer = csv.writer(out)
+    writer.writerow(["claimant", "net_acres", "net_acres_decimal", "unit_share", "unit_percentage", "tracts"])
+    for name, net_acres, unit_share, holdings in rows:
+        tracts = "; ".join(f"{tract} {share}" for tract, share, _ in holdings)
+        writer.writerow([name, str(net_acres), f"{float(net_acres):.8f}", str(unit_share),
+                         f"{float(unit_share) * 100:.8f}", tracts])
+
+
+def write_consolidated_text(out, rows, unit_acres):
+    out.write(f"Unit: {unit_acres} net acres ({float(unit_acres):.4f})\n\n")
+    for name, net_acres, unit_share, holdings in rows:
+        out.write(f"{name}: {net_acres} net acres ({float(net_acres):.8f}), {float(unit_share) * 100:.8f}% of unit\n")
+        for tract, share, tract_acres in holdings:
+            out.write(f"    {tract}: {share} = {float(tract_acres):.8f} net acres\n")
+
+
+def write_consolidated_json(out, rows, unit_acres):
+    json.dump({
+        "unit_acres": str(unit_acres),
+        "claimants": [
+            {
+                "name": name,
+                "net_acres": str(net_acres),
+                "unit_share": str(unit_share),
+                "unit_percentage": f"{float(unit_share) * 100:.8f}",
+                "tracts": [{"tract": tract, "share": str(share), "net_acres": str(tract_acres)}
+                           for tract, share, tract_acres in holdings],
+            }
+            for name, net_acres, unit_share, holdings in rows
+        ],
+    }, out, indent=4)
+    out.write("\n")
+
+
+CONSOLIDATED_WRITERS = {"csv": write_consolidated_csv, "txt": write_consolidated_text, "json": write_consolidated_json}
+
+
+def consolidate_command(args):
+    cache = ClaimantCache(args.cache)
+    failed = 0
+    digests = {}
+    for path, _ in args.tracts:
+        try:
+            digests[path] = file_digest(path)
+        except OSError as e:
+            failed += 1
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+
+    # Only trees whose content is not in the cache are loaded.
+    stale = [path for path, digest in digests.items() if digest not in cache]
+    cached = len(digests) - len(stale)
+    jobs = args.jobs or os.cpu_count() or 1
+    for path, rows, total, error in iter_reports(stale, jobs):
+        if error is not None:
+            failed += 1
+            del digests[path]
+            print(f"{path}: {error}", file=sys.stderr)
+        else:
+            cache.put(digests[path], [(name, Fraction(share)) for name, share, _ in rows])
+
+    tracts = [
+        (os.path.splitext(os.path.basename(path))[0], acres, cache.get(digests[path]))
+        for path, acres in args.tracts if path in digests
+    ]
+    rows, unit_acres = consolidate(tracts)
+    if args.cache:
+        cache.save()
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w', newline="", encoding="utf-8")
+    try:
+        CONSOLIDATED_WRITERS[args.format](out, rows, unit_acres)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Consolidated {len(tracts)} of {len(args.tracts)} tracts ({cached} from the cache).", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def write_changes_text(out, diff):
+    if not diff:
+        out.write("No changes.\n")
+    for name, change in diff.claimants:
+        out.write(f"{name}: {'+' if change > 0 else ''}{change} ({float(change) * 100:+.8f}%)\n")
+    if diff.claimants:
+        out.write("\n")
+    for node_id, parent_id, name, share, size in diff.added:
+        out.write(f"Added {name} ({node_id}) under {parent_id or 'the tree'}: {share}, {size} {'person' if size == 1 else 'people'}\n")
+    for node_id, parent_id, name, share, size in diff.removed:
+        out.write(f"Removed {name} ({node_id}) from {parent_id or 'the tree'}: {share}, {size} {'person' if size == 1 else 'people'}\n")
+    for node_id, name, old_share, new_share in diff.rescaled:
+        out.write(f"Share of {name} ({node_id}): {old_share} -> {new_share}\n")
+    for node_id, old_name, new_name, old_share, new_share in diff.changed:
+        renamed = f" renamed {new_name}" if new_name != old_name else ""
+        out.write(f"Changed {old_name} ({node_id}){renamed}: {old_share} -> {new_share}\n")
+
+
+def write_changes_json(out, diff):
+    json.dump({
+        "claimants": [{"name": name, "change": str(change)} for name, change in diff.claimants],
+        "added": [{"id": node_id, "parent": parent_id, "name": name, "share": str(share), "people": size}
+                  for node_id, parent_id, name, share, size in diff.added],
+        "removed": [{"id": node_id, "parent": parent_id, "name": name, "share": str(share), "people": size}
+                    for node_id, parent_id, name, share, size in diff.removed],
+        "rescaled": [{"id": node_id, "name": name, "old_share": str(old_share), "new_share": str(new_share)}
+                     for node_id, name, old_share, new_share in diff.rescaled],
+        "changed": [{"id": node_id, "old_name": old_name, "new_name": new_name,
+                     "old_share": str(old_share), "new_share": str(new_share)}
+                    for node_id, old_name, new_name, old_share, new_share in diff.changed],
+        "compared": diff.compared,
+    }, out, indent=4)
+    out.write("\n")
+
+
+CHANGES_WRITERS = {"txt": write_changes_text, "json": write_changes_json}
+
+
+def diff_command(args):
+    try:
+        old = load_ledger(args.old)
+        new = load_ledger(args.new)
+        diff = new.diff(old)
+    except Exception as e:
+        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+        return 2
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w', newline="", encoding="utf-8")
+    try:
+        CHANGES_WRITERS[args.format](out, diff)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if diff else 0
+
+
+def serve_command(args):
+    # asyncio is only loaded for the service.
+    import asyncio
+    import service
+
+    if args.socket and not hasattr(asyncio, "start_unix_server"):
+        print("Unix sockets are not available on this system; use --port.", file=sys.stderr)
+        return 2
+    if not os.path.isdir(args.root):
+        print(f"{args.root} is not a folder.", file=sys.stderr)
+        return 2
+
+    def ready(server):
+        where = args.socket or "{}:{}".format(*server.sockets[0].getsockname()[:2])
+        print(f"Serving trees in {os.path.abspath(args.root)} on {where}. Press Ctrl+C to stop.", file=sys.stderr)
+
+    try:
+        asyncio.run(service.serve(args.root, args.host, args.port, args.socket, args.max_trees, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Heirloom Head Right Calculator command line.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="Write one combined claimants report for many saved trees.")
+    report.add_argument("paths", nargs="+", help="Tree files (.json or .vest), wildcards or directories.")
+    report.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    report.add_argument("-o", "--output", default="-", help="Output file (default: standard output).")
+    report.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes (default: one per CPU).")
+    report.set_defaults(func=report_command)
+
+    unit = commands.add_parser("consolidate", help="Combine the claimants of several tracts into one report weighted by net acres.")
+    unit.add_argument("tracts", nargs="+", type=parse_tract, metavar="PATH=NET_ACRES", help="A tree file and the tract's net acres.")
+    unit.add_argument("--format", choices=sorted(CONSOLIDATED_WRITERS), default="csv")
+    unit.add_argument("-o", "--output", default="-", help="Output file (default: standard output).")
+    unit.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes (default: one per CPU).")
+    unit.add_argument("--cache", help="JSON file of earlier results, reused for trees that have not changed.")
+    unit.set_defaults(func=consolidate_command)
+
+    changes = commands.add_parser("diff", help="List what changed between two saved versions of a tree.")
+    changes.add_argument("old", help="The earlier tree file.")
+    changes.add_argument("new", help="The later tree file.")
+    changes.add_argument("--format", choices=sorted(CHANGES_WRITERS), default="txt")
+    changes.add_argument("-o", "--output", default="-", help="Output file (default: standard output).")
+    changes.set_defaults(func=diff_command)
+
+    serve = commands.add_parser("serve", help="Answer JSON-RPC requests for the trees in a folder from other programs on this computer.")
+    serve.add_argument("--root", default=".", help="Folder of tree files (default: the current folder).")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1, this computer only).")
+    serve.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765).")
+    serve.add_argument("--socket", help="Listen on this Unix socket instead of a TCP port.")
+    serve.add_argument("--max-trees", type=int, default=32, help="Trees kept loaded in memory (default: 32).")
+    serve.set_defaults(func=serve_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
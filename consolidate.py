@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from fractions import Fraction
+
+from rational import ExactSum
+from storage import READ_CHUNK_SIZE, atomic_write
+
+CACHE_ENTRIES = 1000
+
+
+def person_key(name):
+    # The same person is often typed with different case or spacing in
+    # different tracts.
+    return " ".join(name.casefold().split())
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ClaimantCache:
+    """Claimant lists of trees keyed by a hash of their content, so a
+    report only works out again the trees that have changed.
+
+    The least recently used entries are dropped beyond max_entries. With
+    a path the cache is read from that JSON file and save() writes it
+    back, so it lasts from one run to the next.
+    """
+
+    def __init__(self, path=None, max_entries=CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding="utf-8") as f:
+                for digest, claimants in json.load(f).items():
+                    self.entries[digest] = [(name, Fraction(share)) for name, share in claimants]
+
+    def __contains__(self, digest):
+        return digest in self.entries
+
+    def get(self, digest):
+        claimants = self.entries.get(digest)
+        if claimants is not None:
+            self.entries.move_to_end(digest)
+        return claimants
+
+    def put(self, digest, claimants):
+        self.entries[digest] = claimants
+        self.entries.move_to_end(digest)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def claimants(self, digest, compute):
+        """Return the cached claimants for digest, calling compute() and
+        keeping its result if there are none."""
+        claimants = self.get(digest)
+        if claimants is None:
+            claimants = compute()
+            self.put(digest, claimants)
+        return claimants
+
+    def save(self):
+        data = {
+            digest: [[name, str(share)] for name, share in claimants]
+            for digest, claimants in self.entries.items()
+        }
+        atomic_write(self.path, lambda f: json.dump(data, f), encoding="utf-8")
+
+
+def consolidate(tracts):
+    """Combine the claimants of several tracts into one unit report.
+
+    tracts is an iterable of (tract, acres, claimants), where claimants
+    are (name, share) pairs and acres is the tract's net acreage. Returns
+    (rows, unit_acres) with one row (name, net_acres, unit_share,
+    holdings) per person, ordered by name. holdings lists (tract, share,
+    net_acres) for every tract the person has an interest in. People are
+    matched across tracts by name, ignoring case and spacing.
+    """
+    unit_acres = ExactSum()
+    # Hash join: each tract's claimants probe the table of the people
+    # seen so far, which is built as they come.
+    people = {}
+    for tract, acres, claimants in tracts:
+        unit_acres.add(acres)
+        for name, share in claimants:
+            if not share:
+                continue
+            key = person_key(name)
+            person = people.get(key)
+            if person is None:
+                person = people[key] = (name, ExactSum(), [])
+            net_acres = share * acres
+            person[1].add(net_acres)
+            person[2].append((tract, share, net_acres))
+
+    unit = unit_acres.value()
+    rows = []
+    for key, (name, net_acres, holdings) in sorted(people.items()):
+        net_acres = net_acres.value()
+        rows.append((name, net_acres, net_acres / unit if unit else Fraction(0), holdings))
+    return rows, unit
+
+
+def compare_claimants(columns):
+    """Line up several claimant lists person by person, e.g. a tree and
+    its what-if scenarios.
+
+    columns is a list of claimant lists of (name, share) pairs. Returns
+    (name, shares) rows ordered by name, where shares holds the person's
+    total in each column in turn, zero where they have none.
+    """
+    people = {}
+    for i, claimants in enumerate(columns):
+        for name, share in claimants:
+            key = person_key(name)
+            person = people.get(key)
+            if person is None:
+                person = people[key] = (name, [ExactSum() for _ in columns])
+            person[1][i].add(share)
+    return [(name, [total.value() for total in totals]) for key, (name, totals) in sorted(people.items())]
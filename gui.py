@@ -0,0 +1,1702 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from fractions import Fraction
+from collections import OrderedDict
+import itertools
+import os
+import re
+import threading
+import time
+
+import instrument
+from instrument import instrumented
+from ledger import ShareLedger, LedgerError
+from rational import ExactSum
+from storage import TREE_EXTENSIONS, Cancelled, Progress, load_ledger, save_ledger, pack_ledger, unpack_ledger, read_import_csv, export_claimants
+
+POLL_INTERVAL_MS = 100
+AUTOSAVE_INTERVAL_MS = 5 * 60 * 1000
+FILE_TYPES = [("JSON Files", "*.json"), ("Compact Tree Files", "*.vest"), ("Tree Databases", "*.vestdb")]
+IMPORT_FILE_TYPES = [("CSV Files", "*.csv *.txt *.tsv"), ("All Files", "*.*")]
+REPORT_FILE_TYPES = [("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl")]
+# Claimants shown at a time in a report.
+REPORT_PAGE_ROWS = 500
+# Tabs beyond this many, least recently shown first, are packed away
+# until they are selected again.
+MAX_LOADED_TABS = int(os.environ.get("VEST_MAX_LOADED_TABS", "4"))
+
+class HeirloomTreeTab(tk.Frame):
+    def __init__(self, master):
+        super().__init__(master)
+        self.pack(expand=True, fill="both")
+        
+        self.instructions_label = tk.Label(self, text="1. Click 'Add Original Owner' to add a trunk to the tree.\n2. Select a person in the tree and click 'Add Heir' to add a successor.\n3. Click 'Generate Report' to see the final claimants and their shares.", justify=tk.LEFT)
+        self.instructions_label.pack(anchor="w", padx=10, pady=5)
+
+        self.tree = ttk.Treeview(self, columns=("Name", "Share"), show="tree headings")
+        self.tree.heading("#0", text="Heirloom Tree")
+        self.tree.heading("Name", text="Name")
+        self.tree.heading("Share", text="Share")
+        self.tree.pack(expand=True, fill="both")
+        self.tree.tag_configure("over", background="misty rose")
+
+        self.ledger = ShareLedger()
+        self.filename = None
+        # The tree database the tab was last loaded from or saved to, and
+        # the tree's name in it.
+        self.store = None
+        self.store_tree = None
+        self._autosaved_version = 0
+        self._autosave_thread = None
+        self._busy = False
+        # While the tab is packed away: the compressed tree, the ledger
+        # version it was packed at, its id counter, which its forks go on
+        # using, whether it had anything to undo or redo, and the rows
+        # that were open and selected.
+        self.packed = None
+        self._packed_version = 0
+        self._packed_ids = None
+        self._packed_history = False
+        self._packed_view = None
+        # (version, content hash) of the tree the last time it was hashed.
+        self._digest = None
+        # People marked over-allocated in the tree, as of the last update.
+        self._over = set()
+
+        self.status_frame = tk.Frame(self)
+        self.status_frame.pack(side="bottom", fill="x")
+
+        self.timing_label = tk.Label(self.status_frame, text="", anchor="w", padx=10)
+        self.timing_label.pack(side="left")
+
+        self.total_shares_label = tk.Label(self.status_frame, text="", anchor="e", padx=10)
+        self.total_shares_label.pack(side="right", fill="x", expand=True)
+
+        self.next_problem_button = tk.Button(self.status_frame, text="Next Problem", command=self.next_problem, state="disabled")
+        self.next_problem_button.pack(side="right", padx=10)
+
+        self.problems_label = tk.Label(self.status_frame, text="", fg="salmon")
+        self.problems_label.pack(side="right")
+
+        self.history_label = tk.Label(self.status_frame, text="", fg="dark goldenrod")
+        self.history_label.pack(side="right")
+
+        self.button_frame = tk.Frame(self)
+        self.button_frame.pack(fill="x", pady=10)
+
+        self.add_owner_button = tk.Button(self.button_frame, text="Add Original Owner", command=self.add_original_owner)
+        self.add_owner_button.pack(side="left", padx=10)
+
+        self.add_heir_button = tk.Button(self.button_frame, text="Add Heir", command=self.add_heir)
+        self.add_heir_button.pack(side="left", padx=10)
+
+        self.split_button = tk.Button(self.button_frame, text="Split Among Heirs", command=self.split_among_heirs)
+        self.split_button.pack(side="left", padx=10)
+
+        self.add_reference_button = tk.Button(self.button_frame, text="Add Existing Person", command=self.add_reference)
+        self.add_reference_button.pack(side="left", padx=10)
+
+        self.convey_share_button = tk.Button(self.button_frame, text="Convey Share", command=self.convey_share)
+        self.convey_share_button.pack(side="left", padx=10)
+
+        self.generate_report_button = tk.Button(self.button_frame, text="Generate Report", command=self.generate_report)
+        self.generate_report_button.pack(side="left", padx=10)
+
+        self.save_button = tk.Button(self.button_frame, text="Save", command=self.save_tree)
+        self.save_button.pack(side="right", padx=10)
+
+        self.load_button = tk.Button(self.button_frame, text="Load", command=self.load_tree)
+        self.load_button.pack(side="right", padx=10)
+
+        self.import_button = tk.Button(self.button_frame, text="Import", command=self.import_csv)
+        self.import_button.pack(side="right", padx=10)
+
+        self.redo_button = tk.Button(self.button_frame, text="Redo", command=self.redo)
+        self.redo_button.pack(side="right", padx=10)
+
+        self.undo_button = tk.Button(self.button_frame, text="Undo", command=self.undo)
+        self.undo_button.pack(side="right", padx=10)
+
+        self.clear_all_button = tk.Button(self.button_frame, text="Clear All", command=self.clear_all)
+        self.clear_all_button.pack(side="right", padx=10)
+
+
+        self.context_menu = tk.Menu(self, tearoff=0)
+        self.context_menu.add_command(label="Edit", command=self.edit_selected)
+        self.context_menu.add_command(label="Delete", command=self.delete_selected)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Cancel")
+
+        self.tree.bind("<Button-3>", self.show_context_menu)
+        self.tree.bind("<<TreeviewOpen>>", self._on_tree_open)
+        self.tree.bind("<<TreeviewClose>>", self._on_tree_close)
+        
+        self.update_total_shares()
+
+    def show_context_menu(self, event):
+        region = self.tree.identify_region(event.x, event.y)
+        if region not in ("cell", "tree"):
+            return
+
+        item = self.tree.identify_row(event.y)
+        if item:
+            self.tree.selection_set(item)
+            self.context_menu.post(event.x_root, event.y_root)
+
+    def wait_window(self, window=None):
+        with instrument.session.paused():
+            super().wait_window(window)
+
+    def show_timing(self, record):
+        self.timing_label.config(text=instrument.format_record(record))
+
+    @instrumented("Undo")
+    def undo(self):
+        if not self.ledger.can_undo():
+            messagebox.showinfo("Undo", "Nothing to undo.")
+            return
+        
+        self._sync_view(self.ledger.undo())
+        self.update_total_shares()
+
+    @instrumented("Redo")
+    def redo(self):
+        if not self.ledger.can_redo():
+            messagebox.showinfo("Redo", "Nothing to redo.")
+            return
+
+        self._sync_view(self.ledger.redo())
+        self.update_total_shares()
+
+    # Only the top level and the children of open rows exist in the
+    # Treeview. A closed row with heirs holds a single placeholder child so
+    # the expander shows; opening it swaps in the real rows and closing it
+    # drops them again, so collapsed subtrees live only in the ledger.
+    def _placeholder(self, item):
+        return f"{item}#placeholder"
+
+    def _is_populated(self, item):
+        return item == "" or bool(self.tree.item(item, "open"))
+
+    def _row_text(self, item, name):
+        # References to a person entered elsewhere are marked in the tree.
+        return f"\u21aa {name}" if self.ledger.reference(item) else name
+
+    def _insert_row(self, item, name, share, index="end"):
+        self.tree.insert(self.ledger.parent(item), index, iid=item, text=self._row_text(item, name), values=(name, str(share)),
+                         tags=("over",) if item in self._over else ())
+        if self.ledger.children(item):
+            self.tree.insert(item, "end", iid=self._placeholder(item))
+
+    def _populate(self, item):
+        self.tree.delete(*self.tree.get_children(item))
+        for child, name, share in self.ledger.child_shares(item):
+            self._insert_row(child, name, share)
+
+    def _sync_placeholder(self, item):
+        if not item or not self.tree.exists(item) or self._is_populated(item):
+            return
+        placeholder = self._placeholder(item)
+        if self.ledger.children(item):
+            if not self.tree.exists(placeholder):
+                self.tree.insert(item, "end", iid=placeholder)
+        elif self.tree.exists(placeholder):
+            self.tree.delete(placeholder)
+
+    @instrumented("Expand")
+    def _on_tree_open(self, event):
+        item = self.tree.focus()
+        if item in self.ledger:
+            self._populate(item)
+
+    def _on_tree_close(self, event):
+        # Tk clears the open flag only after this event has been handled.
+        item = self.tree.focus()
+        if item in self.ledger:
+            self.tree.delete(*self.tree.get_children(item))
+            if self.ledger.children(item):
+                self.tree.insert(item, "end", iid=self._placeholder(item))
+
+    def _render_row(self, item):
+        if not self.tree.exists(item):
+            return
+        name = self.ledger.name(item)
+        self.tree.item(item, text=self._row_text(item, name), values=(name, str(self.ledger.share(item))))
+
+    def _show_new_row(self, item):
+        parent = self.ledger.parent(item)
+        if not (parent == "" or self.tree.exists(parent)):
+            return
+        if not self._is_populated(parent):
+            self._sync_placeholder(parent)
+            return
+        siblings = self.ledger.children(parent)
+        index = "end"
+        for sibling in siblings[siblings.index(item) + 1:]:
+            if self.tree.exists(sibling):
+                index = self.tree.index(sibling)
+                break
+        self._insert_row(item, self.ledger.name(item), self.ledger.share(item), index)
+
+    @instrumented("Show Tree")
+    def _render_all(self):
+        self.tree.delete(*self.tree.get_children())
+        self._populate("")
+        self.history_label.config(text="")
+
+    def _refresh_subtree(self, item):
+        if not self.tree.exists(item):
+            return
+        self._render_row(item)
+        stack = [item]
+        while stack:
+            parent = stack.pop()
+            if not self._is_populated(parent):
+                continue
+            for child, name, share in self.ledger.child_shares(parent):
+                self.tree.item(child, text=self._row_text(child, name), values=(name, str(share)))
+                stack.append(child)
+
+    def _sync_view(self, changes):
+        updated = []
+        for action, item, parent in changes:
+            if action == "reset":
+                self._render_all()
+            elif action == "detach":
+                if self.tree.exists(item):
+                    self.tree.delete(item)
+                self._sync_placeholder(parent)
+            elif action == "attach":
+                if not self.tree.exists(item):
+                    self._show_new_row(item)
+            else:
+                updated.append(item)
+
+        for item in updated:
+            self._refresh_subtree(item)
+
+    @instrumented("Clear All")
+    def clear_all(self):
+        with instrument.session.paused():
+            confirmed = messagebox.askokcancel("Clear All", "Are you sure you want to clear the entire tree?")
+        if confirmed:
+            self.ledger.clear()
+            self.tree.delete(*self.tree.get_children())
+            self.update_total_shares()
+
+    def update_total_shares(self):
+        total_share = self.ledger.total_share()
+        percentage = float(total_share) * 100
+        
+        color = "black"
+        if len(self.ledger):
+            if total_share < 1:
+                color = "dark goldenrod"
+            elif total_share > 1:
+                color = "salmon"
+            elif total_share == 1:
+                color = "forest green"
+
+        self.total_shares_label.config(text=f"Total Shares: {total_share} ({percentage:.4f}%)", fg=color)
+        if self.ledger.can_undo():
+            self.history_label.config(text="")
+        self.update_problems()
+
+    def update_problems(self):
+        """Mark the rows of people whose heirs were given more than their
+        own share. Only rows that changed either way are touched."""
+        over = self.ledger.over_allocated()
+        for item in over.symmetric_difference(self._over):
+            if self.tree.exists(item):
+                self.tree.item(item, tags=("over",) if item in over else ())
+        self._over = over
+        if over:
+            self.problems_label.config(text=f"Over-allocated: {len(over)}")
+            self.next_problem_button.config(state="normal")
+        else:
+            self.problems_label.config(text="")
+            self.next_problem_button.config(state="disabled")
+
+    def _tree_position(self, item):
+        position = []
+        while item:
+            parent = self.ledger.parent(item)
+            position.append(self.ledger.children(parent).index(item))
+            item = parent
+        return position[::-1]
+
+    def show_item(self, item):
+        """Open the rows above item, then select it and scroll to it."""
+        ancestors = []
+        parent = self.ledger.parent(item)
+        while parent:
+            ancestors.append(parent)
+            parent = self.ledger.parent(parent)
+        for ancestor in reversed(ancestors):
+            if not self.tree.item(ancestor, "open"):
+                self.tree.item(ancestor, open=True)
+                self._populate(ancestor)
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+        self.tree.see(item)
+
+    @instrumented("Next Problem")
+    def next_problem(self):
+        """Select the next over-allocated person after the selection, in
+        tree order, going back to the first after the last."""
+        if not self._over:
+            return
+        positions = {item: self._tree_position(item) for item in self._over}
+        order = sorted(positions, key=positions.get)
+        selection = self.tree.selection()
+        item = order[0]
+        if selection and selection[0] in self.ledger:
+            current = self._tree_position(selection[0])
+            item = next((other for other in order if positions[other] > current), order[0])
+        self.show_item(item)
+
+    def _set_tab_title(self, filename):
+        try:
+            notebook = self.master.master
+            notebook.tab(self.master, text=os.path.splitext(os.path.basename(filename))[0])
+        except Exception:
+            pass
+
+    def _run_in_background(self, title, work, on_done):
+        """Run work(progress) on a worker thread behind a progress dialog.
+
+        Tk is not thread-safe, so the worker never touches widgets; the UI
+        thread polls it through after() and calls on_done(result, error)
+        once it has finished.
+        """
+        progress = Progress()
+        dialog = ProgressDialog(self, title, progress)
+        outcome = {}
+
+        def target():
+            start = time.perf_counter()
+            try:
+                outcome["result"] = work(progress)
+            except BaseException as e:
+                outcome["error"] = e
+            outcome["wall_ms"] = (time.perf_counter() - start) * 1000
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._busy = True
+
+        def poll():
+            if thread.is_alive():
+                dialog.update()
+                self.after(POLL_INTERVAL_MS, poll)
+                return
+            self._busy = False
+            dialog.top.destroy()
+            instrument.session.log(title, outcome["wall_ms"])
+            on_done(outcome.get("result"), outcome.get("error"))
+
+        self.after(POLL_INTERVAL_MS, poll)
+
+    @instrumented("Save")
+    def save_tree(self):
+        with instrument.session.paused():
+            filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=FILE_TYPES)
+        if not filename:
+            return
+        if filename.lower().endswith(".vestdb"):
+            self.save_to_store(filename)
+            return
+
+        # Forking costs a copy of the node table, where listing the records
+        # here would hold up the UI for as long as the tree is large.
+        tree = self.ledger.fork()
+        version = self.ledger.version
+
+        def done(result, error):
+            if isinstance(error, Cancelled):
+                return
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save tree: {error}")
+                return
+            self.filename = filename
+            self._autosaved_version = version
+            messagebox.showinfo("Success", "Tree saved successfully.")
+            self._set_tab_title(filename)
+
+        self._run_in_background("Saving Tree", lambda progress: save_ledger(filename, list(tree.records()), progress, tree.next_id), done)
+
+    @instrumented("Load")
+    def load_tree(self):
+        with instrument.session.paused():
+            filename = filedialog.askopenfilename(defaultextension=".json", filetypes=[("Tree Files", "*.json *.vest *.vestdb")] + FILE_TYPES)
+        if not filename:
+            return
+
+        with instrument.session.paused():
+            confirmed = messagebox.askokcancel("Load Tree", "Loading a tree will clear the current one. Continue?")
+        if not confirmed:
+            return
+        if filename.lower().endswith(".vestdb"):
+            self.open_from_store(filename)
+            return
+
+        def done(ledger, error):
+            if isinstance(error, Cancelled):
+                return
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to load tree: {error}")
+                return
+            self.ledger.adopt(ledger)
+            self._render_all()
+            self.update_total_shares()
+            self.filename = filename
+            self._autosaved_version = self.ledger.version
+            messagebox.showinfo("Success", "Tree loaded successfully.")
+            self._set_tab_title(filename)
+
+        self._run_in_background("Loading Tree", lambda progress: load_ledger(filename, progress), done)
+
+    def save_to_store(self, filename):
+        """Save to a tree database. Saving again to the database the tab
+        came from writes only the people changed since."""
+        from store import TreeStore
+        same = self.store is not None and os.path.abspath(self.store.path) == os.path.abspath(filename)
+        name = self.store_tree if same else os.path.splitext(os.path.basename(filename))[0]
+        ledger = self.ledger
+        version = ledger.version
+
+        def work(progress):
+            progress.update(0.0, "Writing tree...")
+            store = self.store if same else TreeStore(filename)
+            try:
+                store.save(name, ledger)
+            except BaseException:
+                if not same:
+                    store.close()
+                raise
+            return store
+
+        def done(store, error):
+            if isinstance(error, Cancelled):
+                return
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save tree: {error}")
+                return
+            if not same and self.store is not None:
+                # Saving elsewhere read in the whole tree, so the old
+                # database is no longer needed.
+                self.store.close()
+            self.store = store
+            self.store_tree = name
+            self.filename = filename
+            self._autosaved_version = version
+            messagebox.showinfo("Success", "Tree saved successfully.")
+            self._set_tab_title(filename)
+
+        self._run_in_background("Saving Tree", work, done)
+
+    def open_from_store(self, filename):
+        """Open a tree database. Only the top of the tree is read now;
+        each branch is read when it is first opened. The tab starts a
+        fresh undo history."""
+        from store import TreeStore
+        try:
+            store = TreeStore(filename)
+            names = store.tree_names()
+            if not names:
+                store.close()
+                raise LedgerError("The file holds no trees.")
+            name = os.path.splitext(os.path.basename(filename))[0]
+            if name not in names:
+                name = names[0]
+            ledger = store.open(name)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load tree: {e}")
+            return
+        if self.store is not None:
+            self.store.close()
+        self.ledger = ledger
+        self.store = store
+        self.store_tree = name
+        self._render_all()
+        self.update_total_shares()
+        self.filename = filename
+        self._autosaved_version = ledger.version
+        messagebox.showinfo("Success", "Tree loaded successfully.")
+        self._set_tab_title(filename)
+
+    @instrumented("Import")
+    def import_csv(self):
+        with instrument.session.paused():
+            filename = filedialog.askopenfilename(filetypes=IMPORT_FILE_TYPES)
+        if not filename:
+            return
+
+        def done(rows, error):
+            if isinstance(error, Cancelled):
+                return
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to read {os.path.basename(filename)}: {error}")
+                return
+            self.add_imported_rows(rows)
+
+        self._run_in_background("Reading Import", lambda progress: read_import_csv(filename, progress), done)
+
+    @instrumented("Add Imported Rows")
+    def add_imported_rows(self, rows):
+        try:
+            new_items = self.ledger.import_rows(rows)
+        except LedgerError as e:
+            messagebox.showerror("Import", f"Nothing was imported.\n\n{e}")
+            return
+        # Only the top of each new branch needs a row; the rest appear as
+        # their parents are opened.
+        created = set(new_items)
+        for item in new_items:
+            if self.ledger.parent(item) not in created:
+                self._show_new_row(item)
+        self.update_total_shares()
+        with instrument.session.paused():
+            messagebox.showinfo("Import", f"Imported {len(new_items)} people.")
+
+    def autosave_path(self):
+        if self.filename:
+            root, ext = os.path.splitext(self.filename)
+            # Autosaves are plain files, so a database tab's goes to JSON.
+            if ext.lower() not in TREE_EXTENSIONS:
+                ext = ".json"
+            return f"{root}.autosave{ext}"
+        try:
+            title = self.master.master.tab(self.master, "text")
+        except Exception:
+            title = "Tree"
+        import tempfile
+        directory = os.path.join(tempfile.gettempdir(), "Vest")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, re.sub(r"[^\w\- ]", "_", title) + ".autosave.json")
+
+    def autosave(self):
+        """Write the tab to its autosave file on a worker thread if it has
+        changed since the last save. Editing continues meanwhile, since the
+        worker only sees a fork taken here."""
+        version = self._packed_version if self.packed is not None else self.ledger.version
+        if version == self._autosaved_version:
+            return
+        if self._autosave_thread is not None and self._autosave_thread.is_alive():
+            return
+        # A save or load on a worker thread may be using the tree.
+        if self._busy:
+            return
+
+        if self.packed is not None:
+            packed = self.packed
+            ids = self._packed_ids
+
+            def snapshot():
+                ledger = unpack_ledger(packed)
+                ledger.use_ids(ids)
+                return ledger
+        else:
+            tree = self.ledger.fork()
+            snapshot = lambda: tree
+        path = self.autosave_path()
+
+        def target():
+            try:
+                ledger = snapshot()
+                save_ledger(path, list(ledger.records()), next_id=ledger.next_id)
+            except OSError:
+                return
+            self._autosaved_version = version
+
+        self._autosave_thread = threading.Thread(target=target, daemon=True)
+        self._autosave_thread.start()
+
+    def content_digest(self):
+        """Hash of the tree's content, worked out again only after a change.
+        It is the ledger's subtree_hash(), which after an edit hashes only
+        the nodes on the path to it again."""
+        version = self._packed_version if self.packed is not None else self.ledger.version
+        if self._digest is None or self._digest[0] != version:
+            self._digest = (version, self.tree_ledger().subtree_hash().hex())
+        return self._digest[1]
+
+    def tree_claimants(self):
+        return self.tree_ledger().claimants()
+
+    def tree_ledger(self):
+        """The tab's ledger, or a copy unpacked for the moment while the
+        tab is packed away."""
+        if self.packed is not None:
+            return self._unpack()
+        return self.ledger
+
+    def _unpack(self):
+        ledger = unpack_ledger(self.packed)
+        ledger.use_ids(self._packed_ids)
+        return ledger
+
+    def dehydrate(self):
+        """Pack the tree into a compressed snapshot and drop the ledger,
+        its undo history and the Treeview rows until rehydrate(). A tree
+        kept in a database is left alone: it reads only what is shown
+        anyway, and packing it would lose track of what to save there."""
+        if self.packed is not None or self._busy or self.store is not None or not len(self.ledger):
+            return
+        open_items = []
+        stack = list(self.tree.get_children())
+        while stack:
+            item = stack.pop()
+            if item in self.ledger and self.tree.item(item, "open"):
+                open_items.append(item)
+                stack.extend(self.tree.get_children(item))
+        self._packed_view = (open_items, self.tree.selection(), self.tree.yview()[0])
+        self._packed_version = self.ledger.version
+        self._packed_ids = self.ledger.id_counter
+        self._packed_history = self.ledger.can_undo() or self.ledger.can_redo()
+        self.packed = pack_ledger(self.ledger)
+        self.ledger = ShareLedger()
+        self.tree.delete(*self.tree.get_children())
+
+    @instrumented("Restore Tab")
+    def rehydrate(self):
+        if self.packed is None:
+            return
+        dirty = self._packed_version != self._autosaved_version
+        self.ledger = self._unpack()
+        self.packed = None
+        # The unpacked ledger starts its own version count.
+        self._digest = (self.ledger.version, self._digest[1]) if self._digest and self._digest[0] == self._packed_version else None
+        self._autosaved_version = -1 if dirty else self.ledger.version
+        self._render_all()
+        if self._packed_history:
+            self.history_label.config(text="Undo history cleared while the tab was packed away")
+
+        open_items, selection, top = self._packed_view
+        self._packed_view = None
+        # Parents were recorded before their children, so each is shown
+        # by the time it is reopened.
+        for item in open_items:
+            if self.tree.exists(item):
+                self.tree.item(item, open=True)
+                self._populate(item)
+        selection = [item for item in selection if self.tree.exists(item)]
+        if selection:
+            self.tree.selection_set(selection)
+        self.tree.yview_moveto(top)
+        self.update_total_shares()
+
+    @instrumented("Add Original Owner")
+    def add_original_owner(self):
+        num_original_owners = len(self.ledger.original_owners())
+        default_share = Fraction(1, num_original_owners + 1)
+        
+        dialog = AddOriginalOwnerDialog(self, default_share)
+        self.wait_window(dialog.top)
+
+        if dialog.name and dialog.share_fraction is not None:
+            item_id = self.ledger.add_original_owner(dialog.name, dialog.share_fraction)
+            self._show_new_row(item_id)
+            self.update_total_shares()
+
+    @instrumented("Convey Share")
+    def convey_share(self):
+        source_id = self.tree.selection()
+        if not source_id:
+            messagebox.showerror("Error", "Please select a source node.")
+            return
+        source_id = source_id[0]
+
+        source_remainder = self.ledger.remainder(source_id)
+
+        if source_remainder <= 0:
+            messagebox.showerror("Error", "Source node has no remainder to convey.")
+            return
+
+        def search(query):
+            return self.ledger.search(query, exclude=source_id) # Exclude source from destinations
+
+        dialog = ConveyShareDialog(self, search, source_remainder)
+        self.wait_window(dialog.top)
+
+        if dialog.conveyances:
+            self.ledger.convey(source_id, dialog.conveyances)
+
+            self._render_row(source_id)
+            for dest_id, _ in dialog.conveyances:
+                self._refresh_subtree(dest_id)
+
+            self.update_total_shares()
+
+    @instrumented("Add Heir")
+    def add_heir(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Please select a parent from the tree.")
+            return
+
+        selected_item = selected_item[0]
+        dialog = AddHeirDialog(self)
+        self.wait_window(dialog.top)
+        
+        if dialog.name and dialog.share_fraction:
+            try:
+                item_id = self.ledger.add_heir(selected_item, dialog.name, dialog.share_fraction)
+            except LedgerError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self._show_new_row(item_id)
+            self.update_total_shares()
+
+    @instrumented("Split Among Heirs")
+    def split_among_heirs(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Please select a parent from the tree.")
+            return
+
+        selected_item = selected_item[0]
+        dialog = SplitDialog(self, self.ledger.name(selected_item))
+        self.wait_window(dialog.top)
+
+        if dialog.heirs:
+            try:
+                new_items = self.ledger.split(selected_item, dialog.heirs)
+            except LedgerError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            created = set(new_items)
+            for item in new_items:
+                if self.ledger.parent(item) not in created:
+                    self._show_new_row(item)
+            self.update_total_shares()
+
+    @instrumented("Add Existing Person")
+    def add_reference(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Please select a parent from the tree.")
+            return
+
+        selected_item = selected_item[0]
+        dialog = AddReferenceDialog(self, lambda query: self.ledger.search(query, exclude=selected_item))
+        self.wait_window(dialog.top)
+
+        if dialog.person_id and dialog.share_fraction is not None:
+            try:
+                item_id = self.ledger.add_reference(selected_item, dialog.person_id, dialog.share_fraction)
+            except LedgerError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self._show_new_row(item_id)
+            self.update_total_shares()
+
+    @instrumented("Edit")
+    def edit_selected(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Please select an item to edit.")
+            return
+
+        selected_item = selected_item[0]
+        original_name = self.ledger.name(selected_item)
+
+        try:
+            original_share = self.ledger.relative_share(selected_item)
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        dialog = EditDialog(self, original_name, original_share)
+        self.wait_window(dialog.top)
+
+        if dialog.name and dialog.share_fraction is not None:
+            if self.ledger.edit(selected_item, dialog.name, dialog.share_fraction):
+                messagebox.showwarning("Warning", "The original share was 0. Children's shares cannot be automatically updated and are now likely incorrect. Please edit them manually.")
+            self._refresh_subtree(selected_item)
+            for item in self.ledger.entity_nodes(selected_item):
+                self._render_row(item)
+            self.update_total_shares()
+
+    @instrumented("Delete")
+    def delete_selected(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Please select an item to delete.")
+            return
+
+        selected_item = selected_item[0]
+        is_original_owner = self.ledger.is_original_owner(selected_item)
+
+        parent_item = self.ledger.parent(selected_item)
+        try:
+            self.ledger.delete(selected_item)
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if self.tree.exists(selected_item):
+            self.tree.delete(selected_item)
+        self._sync_placeholder(parent_item)
+
+        if is_original_owner:
+            for owner_id in self.ledger.original_owners():
+                self._refresh_subtree(owner_id)
+        self.update_total_shares()
+
+    @instrumented("Generate Report")
+    def generate_report(self):
+        claimants = self.ledger.iter_claimants()
+        first = next(claimants, None)
+
+        if first is None:
+            messagebox.showinfo("Report", "No claimants to report.")
+            return
+
+        ReportWindow(self, itertools.chain([first], claimants))
+
+class AddHeirDialog:
+    def __init__(self, parent):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Add Heir")
+        
+        self.name_label = tk.Label(self.top, text="Heir's Name:")
+        self.name_label.grid(row=0, column=0, padx=10, pady=5)
+        self.name_entry = tk.Entry(self.top)
+        self.name_entry.grid(row=0, column=1, padx=10, pady=5)
+        
+        self.share_label = tk.Label(self.top, text="Share (e.g., 1/2):")
+        self.share_label.grid(row=1, column=0, padx=10, pady=5)
+        self.share_entry = tk.Entry(self.top)
+        self.share_entry.grid(row=1, column=1, padx=10, pady=5)
+        
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.grid(row=2, columnspan=2, pady=10)
+        
+        self.name = ""
+        self.share_fraction = None
+
+    def ok(self):
+        self.name = self.name_entry.get()
+        share_str = self.share_entry.get()
+        if not self.name:
+            messagebox.showerror("Error", "Please enter a name.", parent=self.top)
+            return
+        try:
+            share_fraction = Fraction(share_str)
+        except (ValueError, ZeroDivisionError):
+            messagebox.showerror("Error", "Invalid fraction format. Please use 'numerator/denominator'.", parent=self.top)
+            return
+        if share_fraction < 0:
+            messagebox.showerror("Error", "Share cannot be negative.", parent=self.top)
+            return
+        self.share_fraction = share_fraction
+        self.top.destroy()
+
+class SplitDialog:
+    # A trailing number such as "1/4", "0.25" or "1", after a comma or a space.
+    FRACTION = re.compile(r"^(.*?)[,\s]\s*(\d+(?:\.\d+)?(?:/\d+)?)$")
+
+    def __init__(self, parent, parent_name):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Split Among Heirs")
+
+        self.label = tk.Label(self.top, justify=tk.LEFT, text=(
+            f"Heirs of {parent_name}, one per line.\n"
+            "Heirs without a fraction share equally, e.g. 'Mary Smith'.\n"
+            "Add a fraction to set a share, e.g. 'Mary Smith, 1/4'.\n"
+            "Indent a line to divide the share of the heir above it (per stirpes)."))
+        self.label.pack(anchor="w", padx=10, pady=5)
+
+        self.text = tk.Text(self.top, width=50, height=15)
+        self.text.pack(expand=True, fill="both", padx=10, pady=5)
+
+        self.button_frame = tk.Frame(self.top)
+        self.button_frame.pack(pady=10)
+
+        self.ok_button = tk.Button(self.button_frame, text="OK", command=self.ok)
+        self.ok_button.pack(side="left", padx=5)
+
+        self.cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.top.destroy)
+        self.cancel_button.pack(side="left", padx=5)
+
+        self.heirs = []
+
+    def ok(self):
+        heirs = []
+        indents = []
+        for line in self.text.get("1.0", "end").expandtabs(4).splitlines():
+            name = line.strip()
+            if not name:
+                continue
+            indent = len(line) - len(line.lstrip())
+            while indents and indents[-1] >= indent:
+                indents.pop()
+            fraction = None
+            match = self.FRACTION.match(name)
+            if match and match.group(1).strip():
+                try:
+                    fraction = Fraction(match.group(2))
+                except ZeroDivisionError:
+                    messagebox.showerror("Error", f"Invalid fraction for {match.group(1)}.", parent=self.top)
+                    return
+                name = match.group(1).strip().rstrip(",").strip()
+            heirs.append((len(indents), name, fraction))
+            indents.append(indent)
+        if not heirs:
+            messagebox.showerror("Error", "Please enter at least one heir.", parent=self.top)
+            return
+        self.heirs = heirs
+        self.top.destroy()
+
+class AddReferenceDialog:
+    def __init__(self, parent, search):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Add Existing Person")
+
+        self.search = search
+        self.node_map = {}
+
+        self.person_label = tk.Label(self.top, text="Person (type to search):")
+        self.person_label.grid(row=0, column=0, padx=10, pady=5)
+        self.person_var = tk.StringVar()
+        self.person_combobox = ttk.Combobox(self.top, textvariable=self.person_var, width=40)
+        self.person_combobox['values'] = self.find_people("")
+        self.person_combobox.grid(row=0, column=1, padx=10, pady=5)
+        self.person_var.trace_add("write", lambda *args: self.person_combobox.configure(values=self.find_people(self.person_var.get())))
+
+        self.share_label = tk.Label(self.top, text="Share (e.g., 1/2):")
+        self.share_label.grid(row=1, column=0, padx=10, pady=5)
+        self.share_entry = tk.Entry(self.top)
+        self.share_entry.grid(row=1, column=1, padx=10, pady=5)
+
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.grid(row=2, columnspan=2, pady=10)
+
+        self.person_id = None
+        self.share_fraction = None
+
+    def find_people(self, query):
+        values = []
+        for name, item_id in self.search(query):
+            display_text = f"{name} ({item_id})"
+            self.node_map[display_text] = item_id
+            values.append(display_text)
+        return values
+
+    def ok(self):
+        person_id = self.node_map.get(self.person_var.get())
+        if not person_id:
+            messagebox.showerror("Error", "Please choose a person from the list.", parent=self.top)
+            return
+        try:
+            share_fraction = Fraction(self.share_entry.get())
+        except (ValueError, ZeroDivisionError):
+            messagebox.showerror("Error", "Invalid fraction format. Please use 'numerator/denominator'.", parent=self.top)
+            return
+        if share_fraction < 0:
+            messagebox.showerror("Error", "Share cannot be negative.", parent=self.top)
+            return
+        self.person_id = person_id
+        self.share_fraction = share_fraction
+        self.top.destroy()
+
+class EditDialog:
+    def __init__(self, parent, original_name, original_share):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Edit Item")
+        
+        self.name_label = tk.Label(self.top, text="Name:")
+        self.name_label.grid(row=0, column=0, padx=10, pady=5)
+        self.name_entry = tk.Entry(self.top)
+        self.name_entry.grid(row=0, column=1, padx=10, pady=5)
+        self.name_entry.insert(0, original_name)
+        
+        self.share_label = tk.Label(self.top, text="Share (e.g., 1/2):")
+        self.share_label.grid(row=1, column=0, padx=10, pady=5)
+        self.share_entry = tk.Entry(self.top)
+        self.share_entry.grid(row=1, column=1, padx=10, pady=5)
+        self.share_entry.insert(0, str(original_share))
+        
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.grid(row=2, columnspan=2, pady=10)
+        
+        self.name = ""
+        self.share_fraction = None
+
+    def ok(self):
+        self.name = self.name_entry.get()
+        share_str = self.share_entry.get()
+        if not self.name:
+            messagebox.showerror("Error", "Please enter a name.", parent=self.top)
+            return
+        try:
+            share_fraction = Fraction(share_str)
+        except (ValueError, ZeroDivisionError):
+            messagebox.showerror("Error", "Invalid fraction format. Please use 'numerator/denominator'.", parent=self.top)
+            return
+        if share_fraction < 0:
+            messagebox.showerror("Error", "Share cannot be negative.", parent=self.top)
+            return
+        self.share_fraction = share_fraction
+        self.top.destroy()
+
+class AddOriginalOwnerDialog:
+    def __init__(self, parent, default_share):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Add Original Owner")
+        
+        self.name_label = tk.Label(self.top, text="Name:")
+        self.name_label.grid(row=0, column=0, padx=10, pady=5)
+        self.name_entry = tk.Entry(self.top)
+        self.name_entry.grid(row=0, column=1, padx=10, pady=5)
+        
+        self.share_label = tk.Label(self.top, text="Share (e.g., 1/2):")
+        self.share_label.grid(row=1, column=0, padx=10, pady=5)
+        self.share_entry = tk.Entry(self.top)
+        self.share_entry.grid(row=1, column=1, padx=10, pady=5)
+        self.share_entry.insert(0, str(default_share))
+        
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.grid(row=2, columnspan=2, pady=10)
+        
+        self.name = ""
+        self.share_fraction = None
+
+    def ok(self):
+        self.name = self.name_entry.get()
+        share_str = self.share_entry.get()
+        if not self.name:
+            messagebox.showerror("Error", "Please enter a name.", parent=self.top)
+            return
+        try:
+            share_fraction = Fraction(share_str)
+        except (ValueError, ZeroDivisionError):
+            messagebox.showerror("Error", "Invalid fraction format. Please use 'numerator/denominator'.", parent=self.top)
+            return
+        if share_fraction < 0:
+            messagebox.showerror("Error", "Share cannot be negative.", parent=self.top)
+            return
+        self.share_fraction = share_fraction
+        self.top.destroy()
+
+class SelectNodeDialog:
+    def __init__(self, parent, nodes):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Select Node")
+        
+        self.label = tk.Label(self.top, text="Select a destination node:")
+        self.label.pack(padx=10, pady=5)
+
+        self.listbox = tk.Listbox(self.top)
+        self.listbox.pack(padx=10, pady=5)
+
+        self.node_map = {}
+        for name, item_id in nodes:
+            display_text = f"{name} ({item_id})"
+            self.listbox.insert(tk.END, display_text)
+            self.node_map[display_text] = item_id
+
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.pack(pady=10)
+
+        self.selected_node_id = None
+
+    def ok(self):
+        selection = self.listbox.curselection()
+        if selection:
+            selected_text = self.listbox.get(selection[0])
+            self.selected_node_id = self.node_map[selected_text]
+            self.top.destroy()
+        else:
+            messagebox.showerror("Error", "Please select a node.", parent=self.top)
+
+class ConveyShareDialog:
+    def __init__(self, parent, search, remainder):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Convey Share")
+
+        self.search = search
+        self.node_map = {}
+        self.remainder = remainder
+        self.recipient_entries = []
+
+        self.info_label = tk.Label(self.top, text=f"Remainder to convey: {self.remainder}")
+        self.info_label.pack(padx=10, pady=5)
+
+        self.recipients_frame = tk.Frame(self.top)
+        self.recipients_frame.pack(padx=10, pady=5)
+
+        self.add_recipient_button = tk.Button(self.top, text="Add Recipient", command=self.add_recipient_entry)
+        self.add_recipient_button.pack(pady=5)
+
+        self.button_frame = tk.Frame(self.top)
+        self.button_frame.pack(pady=10)
+
+        self.ok_button = tk.Button(self.button_frame, text="OK", command=self.ok)
+        self.ok_button.pack(side="left", padx=5)
+
+        self.cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.top.destroy)
+        self.cancel_button.pack(side="left", padx=5)
+
+        self.conveyances = []
+
+    def add_recipient_entry(self):
+        entry_frame = tk.Frame(self.recipients_frame)
+        entry_frame.pack(fill="x", pady=2)
+
+        node_label = tk.Label(entry_frame, text="To:")
+        node_label.pack(side="left", padx=5)
+
+        node_var = tk.StringVar()
+        node_combobox = ttk.Combobox(entry_frame, textvariable=node_var, width=40)
+        node_combobox['values'] = self.find_destinations("")
+        node_combobox.pack(side="left", padx=5)
+        # Narrow the list down as the user types a name or id.
+        node_var.trace_add("write", lambda *args: node_combobox.configure(values=self.find_destinations(node_var.get())))
+
+        share_label = tk.Label(entry_frame, text="Share (portion of remainder):")
+        share_label.pack(side="left", padx=5)
+
+        share_entry = tk.Entry(entry_frame, width=10)
+        share_entry.pack(side="left", padx=5)
+
+        self.recipient_entries.append((node_var, share_entry))
+
+    def find_destinations(self, query):
+        values = []
+        for name, item_id in self.search(query):
+            display_text = f"{name} ({item_id})"
+            self.node_map[display_text] = item_id
+            values.append(display_text)
+        return values
+
+    def ok(self):
+        conveyances = []
+        
+        try:
+            total_portion = sum(Fraction(share_entry.get()) for _, share_entry in self.recipient_entries)
+            if total_portion > 1:
+                messagebox.showerror("Error", "Total portion of remainder cannot exceed 1.", parent=self.top)
+                return
+        except (ValueError, ZeroDivisionError):
+            messagebox.showerror("Error", "Invalid fraction format in one of the share entries.", parent=self.top)
+            return
+
+        for node_var, share_entry in self.recipient_entries:
+            dest_name = node_var.get()
+            share_str = share_entry.get()
+
+            if not dest_name or not share_str:
+                messagebox.showerror("Error", "Please fill all fields for each recipient.", parent=self.top)
+                return
+            
+            dest_id = self.node_map.get(dest_name)
+            if not dest_id:
+                messagebox.showerror("Error", f"Invalid destination node: {dest_name}", parent=self.top)
+                return
+
+            try:
+                portion = Fraction(share_str)
+                if portion < 0:
+                    messagebox.showerror("Error", "Share cannot be negative.", parent=self.top)
+                    return
+                
+                share_to_convey = self.remainder * portion
+                conveyances.append((dest_id, share_to_convey))
+
+            except (ValueError, ZeroDivisionError):
+                messagebox.showerror("Error", f"Invalid fraction format for {dest_name}.", parent=self.top)
+                return
+
+        self.conveyances = conveyances
+        self.top.destroy()
+
+class ProgressDialog:
+    def __init__(self, parent, title, progress):
+        self.top = tk.Toplevel(parent)
+        self.top.title(title)
+        self.top.transient(parent)
+        self.progress = progress
+
+        self.label = tk.Label(self.top, text="", width=40, anchor="w")
+        self.label.pack(padx=10, pady=5)
+
+        self.bar = ttk.Progressbar(self.top, length=300, maximum=100)
+        self.bar.pack(padx=10, pady=5)
+
+        self.cancel_button = tk.Button(self.top, text="Cancel", command=self.cancel)
+        self.cancel_button.pack(pady=10)
+
+        self.top.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.top.grab_set()
+
+    def update(self):
+        self.bar["value"] = self.progress.fraction * 100
+        self.label.config(text=self.progress.message)
+
+    def cancel(self):
+        self.progress.cancel()
+        self.cancel_button.config(state="disabled")
+
+class ReportWindow:
+    """Claimants a page at a time. Clicking a column heading sorts by it,
+    and clicking it again reverses the order."""
+
+    def __init__(self, parent, claimants):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Claimants Report")
+        self.top.geometry("500x400")
+
+        # Claimants with nothing left are counted in the total but not listed.
+        total = ExactSum()
+        self.rows = []
+        for name, share in claimants:
+            total.add(share)
+            if share != 0:
+                self.rows.append((name, share))
+        total_share = total.value()
+        self.page = 0
+        self.sort_column = None
+        self.descending = False
+
+        self.table = ttk.Treeview(self.top, columns=("Name", "Share", "Percentage"), show="headings")
+        for column in ("Name", "Share", "Percentage"):
+            self.table.heading(column, text=column, command=lambda column=column: self.sort_by(column))
+        self.table.pack(expand=True, fill="both")
+
+        self.total_label = tk.Label(self.top, text=f"Total Shares: {total_share} ({float(total_share) * 100:.8f}%)", anchor="w")
+        self.total_label.pack(fill="x", padx=10)
+
+        self.button_frame = tk.Frame(self.top)
+        self.button_frame.pack(fill="x", pady=5)
+        self.previous_button = tk.Button(self.button_frame, text="< Previous", command=lambda: self.show_page(self.page - 1))
+        self.previous_button.pack(side="left", padx=10)
+        self.page_label = tk.Label(self.button_frame, text="")
+        self.page_label.pack(side="left")
+        self.next_button = tk.Button(self.button_frame, text="Next >", command=lambda: self.show_page(self.page + 1))
+        self.next_button.pack(side="left", padx=10)
+        self.export_button = tk.Button(self.button_frame, text="Export...", command=self.export)
+        self.export_button.pack(side="right", padx=10)
+
+        self.show_page(0)
+
+    def page_count(self):
+        return max(1, -(-len(self.rows) // REPORT_PAGE_ROWS))
+
+    def show_page(self, page):
+        self.page = max(0, min(page, self.page_count() - 1))
+        self.table.delete(*self.table.get_children())
+        start = self.page * REPORT_PAGE_ROWS
+        for name, share in self.rows[start:start + REPORT_PAGE_ROWS]:
+            self.table.insert("", "end", values=(name, str(share), f"{float(share) * 100:.8f}%"))
+        self.page_label.config(text=f"Page {self.page + 1} of {self.page_count()} ({len(self.rows)} claimants)")
+        self.previous_button.config(state="normal" if self.page else "disabled")
+        self.next_button.config(state="normal" if self.page + 1 < self.page_count() else "disabled")
+
+    def sort_by(self, column):
+        self.descending = not self.descending if column == self.sort_column else column != "Name"
+        self.sort_column = column
+        if column == "Name":
+            self.rows.sort(key=lambda row: row[0].casefold(), reverse=self.descending)
+        else:
+            self.rows.sort(key=lambda row: row[1], reverse=self.descending)
+        self.show_page(0)
+
+    def export(self):
+        """Write the claimants, in the order shown, to a CSV or JSON Lines
+        file."""
+        filename = filedialog.asksaveasfilename(parent=self.top, defaultextension=".csv", filetypes=REPORT_FILE_TYPES)
+        if not filename:
+            return
+        try:
+            count = export_claimants(filename, self.rows)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export report: {e}", parent=self.top)
+            return
+        messagebox.showinfo("Success", f"Exported {count} claimants.", parent=self.top)
+
+class ConsolidateDialog:
+    def __init__(self, parent, tracts):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Consolidated Report")
+
+        self.label = tk.Label(self.top, text="Net acres of each tract to include (leave blank to leave a tract out):", justify=tk.LEFT)
+        self.label.grid(row=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+        self.entries = []
+        for row, tract in enumerate(tracts, start=1):
+            tk.Label(self.top, text=f"{tract}:").grid(row=row, column=0, padx=10, pady=2, sticky="e")
+            entry = tk.Entry(self.top, width=15)
+            entry.grid(row=row, column=1, padx=10, pady=2, sticky="w")
+            self.entries.append((tract, entry))
+
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.grid(row=len(tracts) + 1, columnspan=2, pady=10)
+
+        self.acres = []
+
+    def ok(self):
+        acres = []
+        for tract, entry in self.entries:
+            text = entry.get().strip()
+            if not text:
+                acres.append(None)
+                continue
+            try:
+                value = Fraction(text)
+            except (ValueError, ZeroDivisionError):
+                messagebox.showerror("Error", f"Invalid acreage for {tract}.", parent=self.top)
+                return
+            if value < 0:
+                messagebox.showerror("Error", "Acreage cannot be negative.", parent=self.top)
+                return
+            acres.append(value)
+        if not any(value is not None for value in acres):
+            messagebox.showerror("Error", "Please enter the net acres of at least one tract.", parent=self.top)
+            return
+        self.acres = acres
+        self.top.destroy()
+
+class ConsolidatedReportWindow:
+    def __init__(self, parent, rows, unit_acres, note):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Consolidated Report")
+        self.top.geometry("600x500")
+
+        self.text = tk.Text(self.top, wrap="word")
+        self.text.pack(expand=True, fill="both")
+
+        lines = [f"Consolidated Report: {unit_acres} net acres ({float(unit_acres):.4f})", ""]
+        for name, net_acres, unit_share, holdings in rows:
+            lines.append(f"{name}: {float(net_acres):.8f} net acres ({float(unit_share) * 100:.8f}% of unit)")
+            for tract, share, tract_acres in holdings:
+                lines.append(f"    {tract}: {share} ({float(tract_acres):.8f} net acres)")
+        lines += ["", note]
+
+        self.text.insert("1.0", "\n".join(lines) + "\n")
+        self.text.config(state="disabled")
+
+class CompareDialog:
+    def __init__(self, parent, tracts):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Compare Claimants")
+
+        self.label = tk.Label(self.top, text="Tabs to compare side by side:", justify=tk.LEFT)
+        self.label.pack(anchor="w", padx=10, pady=5)
+
+        self.vars = []
+        for tract in tracts:
+            var = tk.BooleanVar(value=True)
+            tk.Checkbutton(self.top, text=tract, variable=var).pack(anchor="w", padx=20)
+            self.vars.append(var)
+
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.pack(pady=10)
+
+        self.chosen = []
+
+    def ok(self):
+        chosen = [i for i, var in enumerate(self.vars) if var.get()]
+        if len(chosen) < 2:
+            messagebox.showerror("Error", "Please choose at least two tabs.", parent=self.top)
+            return
+        self.chosen = chosen
+        self.top.destroy()
+
+class TreeChangesDialog:
+    def __init__(self, parent, tracts):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Compare Trees")
+
+        self.tracts = tracts
+        self.old_label = tk.Label(self.top, text="Earlier tree:")
+        self.old_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.old_combobox = ttk.Combobox(self.top, values=tracts, state="readonly", width=40)
+        self.old_combobox.current(0)
+        self.old_combobox.grid(row=0, column=1, padx=10, pady=5)
+
+        self.new_label = tk.Label(self.top, text="Later tree:")
+        self.new_label.grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.new_combobox = ttk.Combobox(self.top, values=tracts, state="readonly", width=40)
+        self.new_combobox.current(1)
+        self.new_combobox.grid(row=1, column=1, padx=10, pady=5)
+
+        self.ok_button = tk.Button(self.top, text="OK", command=self.ok)
+        self.ok_button.grid(row=2, column=0, columnspan=2, pady=10)
+
+        self.chosen = None
+
+    def ok(self):
+        chosen = (self.old_combobox.current(), self.new_combobox.current())
+        if chosen[0] == chosen[1]:
+            messagebox.showerror("Error", "Please choose two different tabs.", parent=self.top)
+            return
+        self.chosen = chosen
+        self.top.destroy()
+
+class TreeChangesWindow:
+    """The changes between two versions of a tree, grouped under headings
+    that start closed."""
+
+    def __init__(self, parent, old_tract, new_tract, diff):
+        self.top = tk.Toplevel(parent)
+        self.top.title(f"Changes from {old_tract} to {new_tract}")
+        self.top.geometry("800x500")
+
+        self.table = ttk.Treeview(self.top, columns=("Before", "After", "Change"), show="tree headings")
+        self.table.heading("#0", text="Person")
+        for column in ("Before", "After", "Change"):
+            self.table.heading(column, text=column)
+        self.table.pack(expand=True, fill="both")
+
+        def percent(share):
+            return f"{float(share) * 100:.8f}%"
+
+        def group(title, rows):
+            heading = self.table.insert("", "end", text=f"{title} ({len(rows)})")
+            for text, values in rows:
+                self.table.insert(heading, "end", text=text, values=values)
+
+        group("Claimants", [
+            (name, ("", "", f"{float(change) * 100:+.8f}%")) for name, change in diff.claimants])
+        group("Added", [
+            (f"{name} ({node_id}, under {parent_id or 'the tree'})" + (f", {size - 1} below" if size > 1 else ""),
+             ("", percent(share), "")) for node_id, parent_id, name, share, size in diff.added])
+        group("Removed", [
+            (f"{name} ({node_id}, under {parent_id or 'the tree'})" + (f", {size - 1} below" if size > 1 else ""),
+             (percent(share), "", "")) for node_id, parent_id, name, share, size in diff.removed])
+        group("Share Changed", [
+            (f"{name} ({node_id})", (percent(old_share), percent(new_share), ""))
+            for node_id, name, old_share, new_share in diff.rescaled])
+        group("Entry Changed", [
+            (f"{old_name} ({node_id})" if old_name == new_name else f"{old_name} \u2192 {new_name} ({node_id})",
+             (percent(old_share), percent(new_share), "")) for node_id, old_name, new_name, old_share, new_share in diff.changed])
+
+        self.note_label = tk.Label(self.top, text=f"{diff.compared} people compared; unchanged branches were skipped.", anchor="w")
+        self.note_label.pack(fill="x", padx=10, pady=5)
+
+class ComparisonWindow:
+    def __init__(self, parent, tracts, rows):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Compare Claimants")
+        self.top.geometry("800x400")
+
+        # With two trees the last column shows what changed between them.
+        headings = ["Claimant", *tracts] + (["Change"] if len(tracts) == 2 else [])
+        self.table = ttk.Treeview(self.top, columns=[f"c{i}" for i in range(len(headings))], show="headings")
+        for i, heading in enumerate(headings):
+            self.table.heading(f"c{i}", text=heading)
+        self.table.tag_configure("changed", background="light yellow")
+        self.table.pack(expand=True, fill="both")
+
+        for name, shares in rows:
+            values = [name] + [f"{float(share) * 100:.8f}%" for share in shares]
+            if len(shares) == 2:
+                values.append(f"{float(shares[1] - shares[0]) * 100:+.8f}%")
+            changed = any(share != shares[0] for share in shares)
+            self.table.insert("", "end", values=values, tags=("changed",) if changed else ())
+
+class HeirloomApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Heirloom Head Right Calculator")
+        self.root.geometry("800x600")
+
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(expand=True, fill="both")
+        self.notebook.bind("<Button-3>", self.show_tab_menu)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        self.tab_menu = tk.Menu(self.root, tearoff=0)
+        self.tab_menu.add_command(label="Close Tab", command=self.close_tab)
+
+        self.menu_bar = tk.Menu(self.root)
+        self.root.config(menu=self.menu_bar)
+        
+        self.file_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="File", menu=self.file_menu)
+        self.file_menu.add_command(label="New Tab", command=self.add_tab)
+        self.autosave_var = tk.BooleanVar(value=os.environ.get("VEST_AUTOSAVE") == "1")
+        self.file_menu.add_checkbutton(label="Autosave", variable=self.autosave_var)
+        self.file_menu.add_separator()
+        self.file_menu.add_command(label="Exit", command=self.root.quit)
+
+        self.reports_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Reports", menu=self.reports_menu)
+        self.reports_menu.add_command(label="Consolidated Report...", command=self.consolidated_report)
+        self.reports_menu.add_command(label="Compare Claimants...", command=self.compare_tabs)
+        self.reports_menu.add_command(label="Compare Trees...", command=self.tree_changes)
+
+        self.scenarios_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Scenarios", menu=self.scenarios_menu)
+        self.scenarios_menu.add_command(label="New What-If Tab", command=self.new_scenario)
+
+        self.diagnostics_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Diagnostics", menu=self.diagnostics_menu)
+        self.timings_var = tk.BooleanVar(value=instrument.session.enabled)
+        self.diagnostics_menu.add_checkbutton(label="Record Timings", variable=self.timings_var, command=self.toggle_timings)
+        self.profile_var = tk.BooleanVar(value=instrument.session.profiler is not None)
+        self.diagnostics_menu.add_checkbutton(label="Profile with cProfile", variable=self.profile_var, command=self.toggle_profiling)
+        self.diagnostics_menu.add_command(label="Save Timing Trace...", command=self.save_timing_trace)
+
+        self.tabs = {}
+        # Ids of the tabs whose trees are loaded, most recently shown last.
+        self.loaded_tabs = OrderedDict()
+        # Claimants of every tree reported on, by content hash; created by
+        # the first report.
+        self.claimant_cache = None
+        self.add_tab()
+        self.root.after(AUTOSAVE_INTERVAL_MS, self.autosave_tick)
+
+    def show_tab_menu(self, event):
+        try:
+            self.clicked_tab_index = self.notebook.index(f"@{event.x},{event.y}")
+            self.tab_menu.post(event.x_root, event.y_root)
+        except tk.TclError:
+            pass
+
+    def close_tab(self):
+        if hasattr(self, 'clicked_tab_index'):
+             tab_frame = self.notebook.tabs()[self.clicked_tab_index]
+             self.notebook.forget(self.clicked_tab_index)
+             self.tabs.pop(str(tab_frame), None)
+             self.loaded_tabs.pop(str(tab_frame), None)
+
+    def add_tab(self):
+        tab_frame = tk.Frame(self.notebook)
+        self.notebook.add(tab_frame, text=f"Tree {len(self.notebook.tabs()) + 1}")
+        tree_app = HeirloomTreeTab(tab_frame)
+        self.tabs[str(tab_frame)] = tree_app
+        self.notebook.select(tab_frame)
+
+    def toggle_timings(self):
+        instrument.session.enabled = self.timings_var.get()
+        if not instrument.session.enabled:
+            for tab in self.tabs.values():
+                tab.timing_label.config(text="")
+
+    def toggle_profiling(self):
+        instrument.session.set_profiling(self.profile_var.get())
+        if self.profile_var.get() and not self.timings_var.get():
+            self.timings_var.set(True)
+            self.toggle_timings()
+
+    def save_timing_trace(self):
+        if not instrument.session.records:
+            messagebox.showinfo("Timing Trace", "No timings have been recorded. Turn on Diagnostics > Record Timings first.")
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
+        if not filename:
+            return
+        try:
+            instrument.session.dump(filename)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save timing trace: {e}")
+
+    def on_tab_changed(self, event):
+        current = self.notebook.select()
+        tab = self.tabs.get(current)
+        if tab is None:
+            return
+        tab.rehydrate()
+        self.loaded_tabs[current] = tab
+        self.loaded_tabs.move_to_end(current)
+        for tab_id in list(self.loaded_tabs):
+            if len(self.loaded_tabs) <= MAX_LOADED_TABS:
+                break
+            if tab_id != current:
+                self.loaded_tabs.pop(tab_id).dehydrate()
+
+    def open_tabs(self):
+        return [(self.notebook.tab(tab_id, "text"), self.tabs[str(tab_id)])
+                for tab_id in self.notebook.tabs() if str(tab_id) in self.tabs]
+
+    def new_scenario(self):
+        """Open a tab holding a copy of the current tree to try changes on.
+        The copy shares the tree's people until either side changes them."""
+        current = self.tabs.get(self.notebook.select())
+        if current is None:
+            return
+        current.rehydrate()
+        title = self.notebook.tab(current.master, "text")
+        ledger = current.ledger.fork()
+        self.add_tab()
+        tab = self.tabs[self.notebook.select()]
+        tab.ledger = ledger
+        tab._autosaved_version = ledger.version
+        tab._render_all()
+        tab.update_total_shares()
+        self.notebook.tab(tab.master, text=f"{title} (what if)")
+
+    def cached_claimants(self, tab):
+        if self.claimant_cache is None:
+            from consolidate import ClaimantCache
+            self.claimant_cache = ClaimantCache()
+        return self.claimant_cache.claimants(tab.content_digest(), tab.tree_claimants)
+
+    def compare_tabs(self):
+        from consolidate import compare_claimants
+        tabs = self.open_tabs()
+        if len(tabs) < 2:
+            messagebox.showinfo("Compare Claimants", "Open a second tab, e.g. with Scenarios > New What-If Tab, to compare.")
+            return
+        dialog = CompareDialog(self.root, [name for name, _ in tabs])
+        self.root.wait_window(dialog.top)
+        if not dialog.chosen:
+            return
+
+        chosen = [tabs[i] for i in dialog.chosen]
+        columns = [self.cached_claimants(tab) for _, tab in chosen]
+        ComparisonWindow(self.root, [name for name, _ in chosen], compare_claimants(columns))
+
+    def tree_changes(self):
+        tabs = self.open_tabs()
+        if len(tabs) < 2:
+            messagebox.showinfo("Compare Trees", "Open the earlier version of the tree in a second tab, or make one with Scenarios > New What-If Tab, to compare.")
+            return
+        dialog = TreeChangesDialog(self.root, [name for name, _ in tabs])
+        self.root.wait_window(dialog.top)
+        if dialog.chosen is None:
+            return
+
+        (old_name, old_tab), (new_name, new_tab) = (tabs[i] for i in dialog.chosen)
+        try:
+            diff = new_tab.tree_ledger().diff(old_tab.tree_ledger())
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if not diff:
+            messagebox.showinfo("Compare Trees", f"{new_name} is the same as {old_name}.")
+            return
+        TreeChangesWindow(self.root, old_name, new_name, diff)
+
+    def consolidated_report(self):
+        from consolidate import consolidate
+        tabs = self.open_tabs()
+        dialog = ConsolidateDialog(self.root, [name for name, _ in tabs])
+        self.root.wait_window(dialog.top)
+        if not dialog.acres:
+            return
+
+        tracts = []
+        worked_out = 0
+        for (name, tab), acres in zip(tabs, dialog.acres):
+            if acres is None:
+                continue
+            if self.claimant_cache is None or tab.content_digest() not in self.claimant_cache:
+                worked_out += 1
+            tracts.append((name, acres, self.cached_claimants(tab)))
+        rows, unit_acres = consolidate(tracts)
+        ConsolidatedReportWindow(self.root, rows, unit_acres,
+                                 f"{worked_out} of {len(tracts)} tracts worked out, the rest unchanged since the last report.")
+
+    def autosave_tick(self):
+        if self.autosave_var.get():
+            for tab in self.tabs.values():
+                tab.autosave()
+        self.root.after(AUTOSAVE_INTERVAL_MS, self.autosave_tick)
+
+def run():
+    root = tk.Tk()
+    app = HeirloomApp(root)
+    root.mainloop()
@@ -0,0 +1,153 @@
+import contextlib
+import functools
+import json
+import os
+import time
+from collections import deque
+
+MAX_RECORDS = 10000
+
+
+def new_profiler():
+    # cProfile is only loaded once profiling is asked for.
+    import cProfile
+    return cProfile.Profile()
+
+
+class CallCounter:
+    """Stand-in for a widget's Tcl interpreter that counts the commands
+    sent through it and passes everything else straight on."""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self.interpreter.call(*args)
+
+    def eval(self, script):
+        self.calls += 1
+        return self.interpreter.eval(script)
+
+    def __getattr__(self, name):
+        return getattr(self.interpreter, name)
+
+
+class Instrumentation:
+    """Timings of tab actions for one session of the application.
+
+    Off unless enabled, from the Diagnostics menu or with VEST_PROFILE=1
+    (VEST_PROFILE=cprofile also runs cProfile). Each outermost action
+    records its wall time, minus any time spent waiting in a dialog, the
+    number of node changes the ledger made and the number of Tcl commands
+    sent to the Treeview.
+    """
+
+    def __init__(self, enabled=False, profile=False):
+        self.enabled = enabled
+        self.records = deque(maxlen=MAX_RECORDS)
+        self.profiler = new_profiler() if profile else None
+        self.started = time.time()
+        self.current = None
+        self._paused = 0.0
+
+    def set_profiling(self, profile):
+        if profile and self.profiler is None:
+            self.profiler = new_profiler()
+        elif not profile:
+            self.profiler = None
+
+    def start(self, action, tree, ledger):
+        if not isinstance(tree.tk, CallCounter):
+            tree.tk = CallCounter(tree.tk)
+        self._paused = 0.0
+        self.current = {
+            "action": action,
+            "time": time.time(),
+            "_start": time.perf_counter(),
+            "_tcl": tree.tk.calls,
+            "_nodes": ledger.nodes_changed,
+        }
+        if self.profiler:
+            self.profiler.enable()
+        return self.current
+
+    def stop(self, record, tree, ledger, error=None):
+        if self.profiler:
+            self.profiler.disable()
+        record["wall_ms"] = (time.perf_counter() - record.pop("_start") - self._paused) * 1000
+        record["nodes_touched"] = ledger.nodes_changed - record.pop("_nodes")
+        record["tcl_calls"] = tree.tk.calls - record.pop("_tcl")
+        record["tree_size"] = len(ledger)
+        if error is not None:
+            record["error"] = type(error).__name__
+        self.current = None
+        self.records.append(record)
+
+    def log(self, action, wall_ms):
+        """Record work that ran outside an action, such as a background save."""
+        if self.enabled:
+            self.records.append({"action": action, "time": time.time(), "wall_ms": wall_ms})
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Leave time spent waiting on the user out of the current action."""
+        if self.current is None:
+            yield
+            return
+        if self.profiler:
+            self.profiler.disable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._paused += time.perf_counter() - start
+            if self.profiler:
+                self.profiler.enable()
+
+    def dump(self, path):
+        """Write the session's records to path as JSON and, when profiling,
+        the cProfile statistics next to it with a .prof extension."""
+        data = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+            "records": list(self.records),
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=4)
+        if self.profiler:
+            self.profiler.dump_stats(os.path.splitext(path)[0] + ".prof")
+
+
+def format_record(record):
+    return (f"{record['action']}: {record['wall_ms']:.1f} ms, "
+            f"{record.get('nodes_touched', 0)} nodes, {record.get('tcl_calls', 0)} Tk calls")
+
+
+session = Instrumentation(
+    enabled=os.environ.get("VEST_PROFILE", "") in ("1", "cprofile"),
+    profile=os.environ.get("VEST_PROFILE") == "cprofile",
+)
+
+
+def instrumented(action):
+    """Measure a HeirloomTreeTab method as the named action while the
+    session is enabled. Actions run from inside another action are part
+    of the outer one."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not session.enabled or session.current is not None:
+                return method(self, *args, **kwargs)
+            record = session.start(action, self.tree, self.ledger)
+            error = None
+            try:
+                return method(self, *args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                session.stop(record, self.tree, self.ledger, error)
+                self.show_timing(record)
+        return wrapper
+    return decorate
@@ -0,0 +1,1524 @@
+from collections import deque
+import heapq
+import itertools
+from fractions import Fraction
+import functools
+import hashlib
+
+from rational import ExactSum, exact_sum, mul, product
+from search import NameIndex
+
+# At most this many problems are listed when an import is rejected.
+MAX_IMPORT_ERRORS = 20
+
+# Put in ShareLedger.unsaved when the whole node table has been swapped.
+REPLACED = object()
+
+
+class LedgerError(ValueError):
+    pass
+
+
+class Node:
+    # Shares are stored relative to the parent's frame: a node's absolute
+    # share is its stored share times the product of its ancestors' scale.
+    # Rescaling everything below a node is then a single multiply of its
+    # scale. child_alloc caches the children's allocated shares and total
+    # the claimant total of the whole subtree, both in the node's frame.
+    # ref, when set, is the id of the person's own entry: the node is the
+    # same person inheriting through another line and has no heirs itself.
+    # owner is the token of the ledger allowed to change the node in place;
+    # any other ledger holding it copies it first.
+    __slots__ = ("id", "parent", "children", "name", "share", "allocated",
+                 "scale", "child_alloc", "child_total", "total", "ref", "owner")
+
+    def __init__(self, node_id, parent, name, share, allocated, ref=None, owner=None):
+        self.id = node_id
+        self.owner = owner
+        self.parent = parent
+        self.children = []
+        self.name = name
+        self.share = share
+        self.allocated = allocated
+        self.ref = ref
+        self.scale = Fraction(1)
+        self.child_alloc = Fraction(0)
+        self.child_total = Fraction(0)
+        self.total = share
+
+    def copy(self, owner):
+        node = Node(self.id, self.parent, self.name, self.share, self.allocated, self.ref, owner)
+        node.children = list(self.children)
+        node.set_state(self.state())
+        return node
+
+    def state(self):
+        return (self.name, self.share, self.allocated, self.scale,
+                self.child_alloc, self.child_total, self.total)
+
+    def set_state(self, state):
+        (self.name, self.share, self.allocated, self.scale,
+         self.child_alloc, self.child_total, self.total) = state
+
+    def claim(self):
+        if not self.children:
+            return self.share
+        children_share = mul(self.scale, self.child_alloc)
+        if self.share > children_share:
+            return self.share - children_share
+        return Fraction(0)
+
+    def over_allocated(self):
+        """Whether the node's heirs were given more than its own share."""
+        return mul(self.scale, self.child_alloc) > self.share
+
+
+class LazyNodes(dict):
+    """Node table of a ledger opened from a store, which reads nodes as
+    they are first looked up.
+
+    fetch(node_id) returns stored rows (see ShareLedger.stored_rows())
+    including node_id's if it exists, usually with its siblings and some
+    of their descendants; fetch_all() returns every row. size is the
+    number of rows in the store. Nodes removed from the table are not
+    read again. Iterating the table reads everything first.
+    """
+
+    def __init__(self, ledger, fetch, fetch_all, size):
+        super().__init__()
+        self.ledger = ledger
+        self.fetch = fetch
+        self.fetch_all = fetch_all
+        self.pending = size
+        self.removed = set()
+
+    def _add(self, rows):
+        owner = self.ledger._token
+        for node_id, parent_id, children, state, ref in rows:
+            if dict.__contains__(self, node_id) or node_id in self.removed:
+                continue
+            node = Node(node_id, parent_id, state[0], state[1], state[2], ref, owner)
+            node.children = list(children)
+            node.set_state(state)
+            dict.__setitem__(self, node_id, node)
+            self.pending -= 1
+
+    def __missing__(self, node_id):
+        if self.pending and node_id not in self.removed:
+            self._add(self.fetch(node_id))
+            if dict.__contains__(self, node_id):
+                return dict.__getitem__(self, node_id)
+        raise KeyError(node_id)
+
+    def __contains__(self, node_id):
+        if dict.__contains__(self, node_id):
+            return True
+        try:
+            self[node_id]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, node_id, default=None):
+        try:
+            return self[node_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, node_id, node):
+        self.removed.discard(node_id)
+        dict.__setitem__(self, node_id, node)
+
+    def __delitem__(self, node_id):
+        dict.__delitem__(self, node_id)
+        self.removed.add(node_id)
+
+    def __len__(self):
+        return dict.__len__(self) + self.pending
+
+    def load_all(self):
+        if self.pending:
+            self._add(self.fetch_all())
+            self.pending = 0
+
+    def __iter__(self):
+        self.load_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self.load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+
+    def items(self):
+        self.load_all()
+        return dict.items(self)
+
+
+class Transaction:
+    """The changes made by one ledger operation.
+
+    ops holds, in the order they happened:
+      ("state", node, before, after)   scalar fields of a node that existed
+                                       before the operation
+      ("insert", parent_id, index, nodes)
+      ("remove", parent_id, index, nodes)
+                                       a subtree attached or detached, root
+                                       first; the node objects are kept
+      ("replace", old_nodes, new_nodes)
+                                       the whole node table swapped
+    """
+
+    __slots__ = ("ops", "touched", "created", "size")
+
+    def __init__(self):
+        self.ops = []
+        self.touched = set()
+        self.created = set()
+        self.size = 0
+
+    def commit(self):
+        for i, op in enumerate(self.ops):
+            if op[0] == "state":
+                self.ops[i] = ("state", op[1], op[2], op[1].state())
+        self.touched = self.created = None
+
+
+class History:
+    """Bounded undo/redo stacks of Transactions.
+
+    Once more than max_steps operations, or more than max_changes
+    recorded node changes in total, are kept, the oldest are dropped.
+    """
+
+    def __init__(self, max_steps=500, max_changes=1_000_000):
+        self.max_steps = max_steps
+        self.max_changes = max_changes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.changes = 0
+
+    def push(self, txn):
+        self.undo_stack.append(txn)
+        self.changes += txn.size
+        for dropped in self.redo_stack:
+            self.changes -= dropped.size
+        self.redo_stack.clear()
+        self._trim()
+
+    def _trim(self):
+        while self.undo_stack and (len(self.undo_stack) > self.max_steps or self.changes > self.max_changes):
+            self.changes -= self.undo_stack.popleft().size
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.changes = 0
+
+
+def recorded(method):
+    """Run a ledger method as one undoable transaction.
+
+    Nested calls join the outer transaction. If the method raises, its
+    partial changes are rolled back before the error propagates.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._txn is not None:
+            return method(self, *args, **kwargs)
+        txn = self._txn = Transaction()
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            self._txn = None
+            self._apply(txn, undo=True)
+            raise
+        self._txn = None
+        if txn.ops:
+            txn.commit()
+            self.history.push(txn)
+            self.version += 1
+            self.nodes_changed += txn.size
+        return result
+    return wrapper
+
+
+class TreeDiff:
+    """What changed from one version of a tree to another; see
+    ShareLedger.diff(). Shares are absolute.
+
+    added and removed hold (node_id, parent_id, name, share, size) for the
+    top of each branch found in only the new or only the old tree, size
+    counting the people in the branch. rescaled holds (node_id, name,
+    old_share, new_share) for people given a different part of their
+    parent's share, with nothing else changed at or below them. changed
+    holds (node_id, old_name, new_name, old_share, new_share) for the
+    other people whose name, reference or part changed. claimants holds
+    (name, change) for each name whose total interest changed. compared
+    counts the people looked at.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.rescaled = []
+        self.changed = []
+        self.claimants = []
+        self.compared = 0
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.rescaled or self.changed or self.claimants)
+
+
+class ShareLedger:
+    """Pure-Python model of an heirloom tree.
+
+    Nodes are keyed by string ids; the id "" is a hidden sentinel whose
+    children are the original owners, mirroring the Treeview root.
+    """
+
+    ROOT = ""
+
+    def __init__(self, max_undo_steps=500, max_undo_changes=1_000_000):
+        # Nodes carrying this token belong to this ledger alone; see fork().
+        self._token = object()
+        self.nodes = {self.ROOT: Node(self.ROOT, None, "", Fraction(0), Fraction(0), owner=self._token)}
+        # Number the next new node's id is made from, in a list that forks
+        # share so that no two of them hand out the same id.
+        self._ids = [1]
+        self._txn = None
+        self.history = History(max_undo_steps, max_undo_changes)
+        self.index = NameIndex()
+        # Person id -> ids of the reference nodes pointing at it.
+        self.referrers = {}
+        # Bumped on every committed change, undo and redo, so callers such
+        # as autosave can tell whether anything happened since they looked.
+        self.version = 0
+        # Running count of node changes made, undone and redone.
+        self.nodes_changed = 0
+        # While a store keeps the tree, the ids of the nodes changed, added
+        # or removed since it last saved them, with REPLACED once the
+        # whole table has been swapped; otherwise None.
+        self.unsaved = None
+        # While over_allocated() is in use, the ids of the nodes it reports
+        # and of the nodes changed since it last looked; _over is None
+        # until the whole table has been checked.
+        self._over = None
+        self._unchecked = None
+        # Node id -> subtree_hash(), for the nodes hashed since they or
+        # anything below them last changed. When a node is here, so is
+        # everything below it.
+        self._hashes = {}
+
+    def __len__(self):
+        return len(self.nodes) - 1
+
+    @property
+    def next_id(self):
+        """Number the next new node's id is made from."""
+        return self._ids[0]
+
+    def reserve_ids(self, next_id):
+        """Make sure no new node gets an id numbered below next_id, e.g.
+        one a saved tree handed out to a node since deleted."""
+        # Forks on other threads may be taking ids from the same counter,
+        # so it is only ever written to move it on.
+        if next_id > self._ids[0]:
+            self._ids[0] = next_id
+
+    @property
+    def id_counter(self):
+        """The counter new ids are taken from, shared with forks; see
+        use_ids()."""
+        return self._ids
+
+    def use_ids(self, counter):
+        """Take new ids from counter, another ledger's id_counter, e.g. when
+        this ledger was rebuilt from a packed copy of that one, so that it
+        and that ledger's forks still never give out the same id."""
+        next_id = self._ids[0]
+        self._ids = counter
+        self.reserve_ids(next_id)
+
+    def __contains__(self, node_id):
+        return node_id != self.ROOT and node_id in self.nodes
+
+    def _new_id(self):
+        while True:
+            node_id = f"N{self._ids[0]}"
+            self._ids[0] += 1
+            if node_id not in self.nodes:
+                return node_id
+
+    def _own(self, node_id):
+        """Return a node that is about to be modified, first copying it if
+        it is shared with a fork."""
+        node = self.nodes[node_id]
+        if node.owner is not self._token:
+            node = self.nodes[node_id] = node.copy(self._token)
+        if self.unsaved is not None:
+            self.unsaved.add(node_id)
+        if self._unchecked is not None:
+            self._unchecked.add(node_id)
+        if self._hashes:
+            self._unhash(node_id)
+        return node
+
+    def _unhash(self, node_id):
+        # Up to the first ancestor that is not hashed, since none above it
+        # are either.
+        hashes = self._hashes
+        nodes = self.nodes
+        while node_id is not None and hashes.pop(node_id, None) is not None:
+            node_id = nodes[node_id].parent
+
+    def _changed(self, subtree):
+        """Note nodes added to or removed from the table."""
+        if self.unsaved is not None:
+            self.unsaved.update(node.id for node in subtree)
+        if self._unchecked is not None:
+            self._unchecked.update(node.id for node in subtree)
+        if self._hashes:
+            for node in subtree:
+                self._hashes.pop(node.id, None)
+
+    def _swapped(self):
+        """Note that the whole table has been swapped."""
+        if self.unsaved is not None:
+            self.unsaved.add(REPLACED)
+        self._over = None
+        self._hashes = {}
+
+    def _touch(self, node_id):
+        """Return a node that is about to be modified, journaling its state."""
+        node = self._own(node_id)
+        txn = self._txn
+        if txn is not None and node_id not in txn.touched and node_id not in txn.created:
+            txn.touched.add(node_id)
+            txn.ops.append(("state", node, node.state(), None))
+            txn.size += 1
+        return node
+
+    def _attach(self, parent_id, index, subtree):
+        nodes = self.nodes
+        for node in subtree:
+            nodes[node.id] = node
+        self._changed(subtree)
+        self._register(subtree)
+        children = self._own(parent_id).children
+        if index is None:
+            index = len(children)
+        children.insert(index, subtree[0].id)
+        txn = self._txn
+        if txn is not None:
+            txn.ops.append(("insert", parent_id, index, subtree))
+            txn.created.update(node.id for node in subtree)
+            txn.size += len(subtree)
+
+    def _detach(self, node_id):
+        node = self.nodes[node_id]
+        subtree = [node]
+        for item, _ in self._preorder(node_id):
+            subtree.append(self.nodes[item])
+        children = self._own(node.parent).children
+        index = children.index(node_id)
+        del children[index]
+        for child in subtree:
+            del self.nodes[child.id]
+        self._changed(subtree)
+        self._unregister(subtree)
+        txn = self._txn
+        if txn is not None:
+            txn.ops.append(("remove", node.parent, index, subtree))
+            txn.size += len(subtree)
+        return subtree
+
+    def _replace(self, nodes):
+        txn = self._txn
+        if txn is not None:
+            txn.ops.append(("replace", self.nodes, nodes))
+            txn.size += len(self.nodes)
+        self.nodes = nodes
+        self._swapped()
+        self._reindex()
+
+    def _register(self, subtree):
+        for node in subtree:
+            self.index.add(node.id, node.name)
+            if node.ref is not None:
+                self.referrers.setdefault(node.ref, set()).add(node.id)
+
+    def _unregister(self, subtree):
+        for node in subtree:
+            self.index.remove(node.id)
+            if node.ref is not None:
+                referrers = self.referrers[node.ref]
+                referrers.discard(node.id)
+                if not referrers:
+                    del self.referrers[node.ref]
+
+    def _reindex(self):
+        self.index.invalidate()
+        self.referrers = {}
+        for node in self.nodes.values():
+            if node.ref is not None:
+                self.referrers.setdefault(node.ref, set()).add(node.id)
+
+    def _apply(self, txn, undo):
+        """Replay a transaction forwards (redo) or backwards (undo).
+
+        Returns the view changes as (action, node_id, parent_id) triples in
+        the order they were applied: "attach" and "detach" for subtrees,
+        "update" for nodes whose name or displayed shares may have changed,
+        and "reset" when the whole table was swapped.
+        """
+        changes = []
+        nodes = self.nodes
+        for op in (reversed(txn.ops) if undo else txn.ops):
+            kind = op[0]
+            if kind == "state":
+                _, node, before, after = op
+                old, new = (after, before) if undo else (before, after)
+                node = self._own(node.id)
+                node.set_state(new)
+                self.index.rename(node.id, node.name)
+                if old is None or old[:4] != new[:4]:
+                    changes.append(("update", node.id, node.parent))
+            elif kind == "replace":
+                _, old_nodes, new_nodes = op
+                self.nodes = nodes = old_nodes if undo else new_nodes
+                self._swapped()
+                self._reindex()
+                changes.append(("reset", self.ROOT, None))
+            else:
+                _, parent_id, index, subtree = op
+                self._changed(subtree)
+                if (kind == "insert") != undo:
+                    for node in subtree:
+                        nodes[node.id] = node
+                    self._register(subtree)
+                    self._own(parent_id).children.insert(index, subtree[0].id)
+                    changes.append(("attach", subtree[0].id, parent_id))
+                else:
+                    # Keep the nodes as they are now, which may be copies
+                    # made since a fork, for when they are attached again.
+                    subtree[:] = [nodes[node.id] for node in subtree]
+                    del self._own(parent_id).children[index]
+                    for node in subtree:
+                        del nodes[node.id]
+                    self._unregister(subtree)
+                    changes.append(("detach", subtree[0].id, parent_id))
+        return changes
+
+    def can_undo(self):
+        return bool(self.history.undo_stack)
+
+    def can_redo(self):
+        return bool(self.history.redo_stack)
+
+    def undo(self):
+        txn = self.history.undo_stack.pop()
+        self.history.redo_stack.append(txn)
+        self.version += 1
+        self.nodes_changed += txn.size
+        return self._apply(txn, undo=True)
+
+    def redo(self):
+        txn = self.history.redo_stack.pop()
+        self.history.undo_stack.append(txn)
+        self.version += 1
+        self.nodes_changed += txn.size
+        return self._apply(txn, undo=False)
+
+    def _frame(self, node_id):
+        """Factor converting a node's stored values to absolute ones."""
+        nodes = self.nodes
+        scales = []
+        parent_id = nodes[node_id].parent
+        while parent_id is not None:
+            parent = nodes[parent_id]
+            scales.append(parent.scale)
+            parent_id = parent.parent
+        return product(scales)
+
+    def parent(self, node_id):
+        return self.nodes[node_id].parent
+
+    def children(self, node_id=ROOT):
+        return self.nodes[node_id].children
+
+    def name(self, node_id):
+        return self.nodes[node_id].name
+
+    def share(self, node_id):
+        return mul(self.nodes[node_id].share, self._frame(node_id))
+
+    def allocated(self, node_id):
+        return mul(self.nodes[node_id].allocated, self._frame(node_id))
+
+    def reference(self, node_id):
+        """Return the id of the person's own entry if node_id is a reference
+        to it, else None."""
+        return self.nodes[node_id].ref
+
+    def entity_nodes(self, node_id):
+        """Return every node standing for the same person as node_id, the
+        person's own entry first."""
+        person_id = self.nodes[node_id].ref or node_id
+        return [person_id, *sorted(self.referrers.get(person_id, ()))]
+
+    def is_original_owner(self, node_id):
+        return self.nodes[node_id].parent == self.ROOT
+
+    def original_owners(self):
+        return self.nodes[self.ROOT].children
+
+    @recorded
+    def insert(self, parent_id, name, share, allocated=None, node_id=None, ref=None):
+        if parent_id not in self.nodes:
+            raise LedgerError(f"Unknown parent node: {parent_id}")
+        if self.nodes[parent_id].ref is not None:
+            raise LedgerError(f"{self.nodes[parent_id].name} appears here through another line. Add their heirs to their own entry.")
+        if node_id is None:
+            node_id = self._new_id()
+        elif node_id in self.nodes:
+            raise LedgerError(f"Duplicate node id: {node_id}")
+        if allocated is None:
+            allocated = share
+
+        parent = self.nodes[parent_id]
+        frame = self._frame(parent_id) * parent.scale
+        if frame == 0 and (share or allocated):
+            self._unzero(parent_id)
+            parent = self.nodes[parent_id]
+            frame = self._frame(parent_id) * parent.scale
+        if frame != 1 and frame != 0:
+            share /= frame
+            allocated /= frame
+
+        node = Node(node_id, parent_id, name, share, allocated, ref, self._token)
+        self._attach(parent_id, None, [node])
+        self._propagate(parent_id, allocated, node.total)
+        return node_id
+
+    @recorded
+    def clear(self):
+        self._replace({self.ROOT: Node(self.ROOT, None, "", Fraction(0), Fraction(0), owner=self._token)})
+
+    def _refresh(self, node_id, old_allocated, old_total):
+        """Recompute a node's cached total after its own share, allocation or
+        scale changed, then carry the difference up to the root."""
+        node = self._touch(node_id)
+        node.total = node.claim() + mul(node.scale, node.child_total)
+        self._propagate(node.parent, node.allocated - old_allocated, node.total - old_total)
+
+    def _propagate(self, node_id, delta_allocated, delta_total):
+        # The first node is always recomputed, since gaining or losing a
+        # child can change its claim even when the deltas are zero.
+        while node_id is not None:
+            node = self._touch(node_id)
+            old_total = node.total
+            node.child_alloc += delta_allocated
+            node.child_total += delta_total
+            node.total = node.claim() + mul(node.scale, node.child_total)
+            delta_allocated = 0
+            delta_total = node.total - old_total
+            if not delta_total:
+                break
+            node_id = node.parent
+
+    def _rebuild_totals(self, node_id=ROOT):
+        nodes = self.nodes
+        for item in self._postorder(node_id):
+            node = nodes[item]
+            child_alloc = ExactSum()
+            child_total = ExactSum()
+            for child in node.children:
+                child_node = nodes[child]
+                child_alloc.add(child_node.allocated)
+                child_total.add(child_node.total)
+            node.child_alloc = child_alloc.value()
+            node.child_total = child_total.value()
+            node.total = node.claim() + mul(node.scale, node.child_total)
+
+    def _unzero(self, node_id):
+        """Give the children of node_id a non-zero frame again.
+
+        A zero scale marks a subtree whose shares were all set to zero.
+        Before a non-zero absolute share can be stored under it, the zero
+        is written into the subtree explicitly and the scale reset.
+        """
+        zeroed = None
+        parent_id = node_id
+        while parent_id is not None:
+            if self.nodes[parent_id].scale == 0:
+                zeroed = parent_id
+            parent_id = self.nodes[parent_id].parent
+        if zeroed is None:
+            return
+
+        node = self.nodes[zeroed]
+        old_total = node.total
+        for item in [zeroed, *(item for item, _ in self._preorder(zeroed))]:
+            child_node = self._touch(item)
+            if item != zeroed:
+                child_node.share = Fraction(0)
+                child_node.allocated = Fraction(0)
+                child_node.total = Fraction(0)
+            child_node.scale = Fraction(1)
+            child_node.child_alloc = Fraction(0)
+            child_node.child_total = Fraction(0)
+        self._refresh(zeroed, node.allocated, old_total)
+
+    def remainder(self, node_id):
+        node = self.nodes[node_id]
+        return (node.share - node.scale * node.child_alloc) * self._frame(node_id)
+
+    @recorded
+    def add_original_owner(self, name, share):
+        if share < 0:
+            raise LedgerError("Share cannot be negative.")
+        return self.insert(self.ROOT, name, share)
+
+    @recorded
+    def add_heir(self, parent_id, name, fraction):
+        if fraction < 0:
+            raise LedgerError("Share cannot be negative.")
+        heir_share = self.share(parent_id) * fraction
+        return self.insert(parent_id, name, heir_share)
+
+    @recorded
+    def add_reference(self, parent_id, person_id, fraction):
+        """Add the person entered at person_id as an heir of parent_id too.
+
+        The new node's share passes to the person's own entry, so their
+        heirs there split everything the person inherits, in proportion to
+        what each was given of the person's own share. Shares conveyed to
+        those heirs from other lines are not affected. A person whose own
+        share is zero has nothing to split by and keeps what they inherit.
+        """
+        if fraction < 0:
+            raise LedgerError("Share cannot be negative.")
+        if person_id not in self:
+            raise LedgerError(f"Unknown node: {person_id}")
+        person_id = self.nodes[person_id].ref or person_id
+        heir_share = self.share(parent_id) * fraction
+        node_id = self.insert(parent_id, self.nodes[person_id].name, heir_share, ref=person_id)
+        self._entity_shares()
+        return node_id
+
+    @recorded
+    def import_rows(self, rows):
+        """Add many people at once as a single change.
+
+        rows are (line, key, parent, name, fraction) tuples in any order.
+        line says where the row came from, for error messages. key names
+        the row for the parent column of other rows and may be empty.
+        parent is the key of another row, the id of a node already in
+        the tree, or empty for an original owner. fraction, a Fraction or
+        a string such as "1/3", is the heir's part of the parent's share,
+        or an original owner's share of the whole.
+
+        Every row is checked before anything changes. If any is wrong, a
+        LedgerError lists the problems and the tree is left as it was.
+        Returns the new node ids in the order of rows.
+        """
+        nodes = self.nodes
+        errors = []
+        entries = []
+        keys = {}
+        for line, key, parent, name, fraction in rows:
+            try:
+                fraction = Fraction(fraction)
+            except (TypeError, ValueError, ZeroDivisionError):
+                errors.append(f"Line {line}: invalid fraction {fraction!r}.")
+                fraction = Fraction(0)
+            if fraction < 0:
+                errors.append(f"Line {line}: share cannot be negative.")
+            if not name:
+                errors.append(f"Line {line}: missing name.")
+            if key:
+                if key in keys:
+                    errors.append(f"Line {line}: duplicate id {key}.")
+                else:
+                    keys[key] = len(entries)
+            entries.append((line, parent, name, fraction))
+
+        # Children of each row, and the rows hanging from existing nodes.
+        children = [[] for _ in entries]
+        attached = {}
+        unplaced = []
+        for i, (line, parent, name, fraction) in enumerate(entries):
+            if parent in keys:
+                children[keys[parent]].append(i)
+            elif parent and parent not in self:
+                errors.append(f"Line {line}: unknown parent {parent}.")
+                unplaced.append(i)
+            elif parent and nodes[parent].ref is not None:
+                errors.append(f"Line {line}: {nodes[parent].name} appears here through another line. Add their heirs to their own entry.")
+                unplaced.append(i)
+            else:
+                attached.setdefault(parent or self.ROOT, []).append(i)
+
+        # Parents before children. Rows never reached are their own
+        # ancestors.
+        order = []
+        stack = [i for tops in attached.values() for i in reversed(tops)] + unplaced
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            stack.extend(reversed(children[i]))
+        reached = set(order)
+        for i, (line, parent, name, fraction) in enumerate(entries):
+            if i not in reached and parent in keys:
+                errors.append(f"Line {line}: {name} is listed as their own ancestor.")
+
+        for i, (line, parent, name, fraction) in enumerate(entries):
+            given = exact_sum(entries[child][3] for child in children[i])
+            if given > 1:
+                errors.append(f"Line {line}: the heirs of {name} are given {given} of their share.")
+        for parent_id, tops in attached.items():
+            given = exact_sum(entries[i][3] for i in tops)
+            if not given:
+                continue
+            if parent_id == self.ROOT:
+                if nodes[self.ROOT].child_alloc + given > 1:
+                    errors.append(f"Original owners would hold {nodes[self.ROOT].child_alloc + given} of the whole.")
+            elif self.share(parent_id) * given > self.remainder(parent_id):
+                errors.append(f"The heirs added to {nodes[parent_id].name} ({parent_id}) are given more than their remaining share.")
+
+        if errors:
+            shown = errors[:MAX_IMPORT_ERRORS]
+            if len(errors) > len(shown):
+                shown.append(f"...and {len(errors) - len(shown)} more.")
+            raise LedgerError("\n".join(shown))
+
+        # New nodes keep a scale of one, so a whole new subtree shares the
+        # frame of the existing node it hangs from.
+        ids = [self._new_id() for _ in entries]
+        stored = [None] * len(entries)
+        # Unzeroing rewrites a whole subtree, which may hold other parents,
+        # so every parent is unzeroed before any base is worked out.
+        for parent_id in attached:
+            if parent_id != self.ROOT and nodes[parent_id].scale == 0 and self.share(parent_id):
+                self._unzero(parent_id)
+        for parent_id, tops in attached.items():
+            parent = nodes[parent_id]
+            if parent_id == self.ROOT:
+                base = Fraction(1)
+            else:
+                base = parent.share / parent.scale if parent.scale else Fraction(0)
+            for i in tops:
+                stored[i] = base * entries[i][3]
+        created = [None] * len(entries)
+        for i in order:
+            node = created[i] = Node(ids[i], None, entries[i][2], stored[i], stored[i], owner=self._token)
+            node.children = [ids[child] for child in children[i]]
+            for child in children[i]:
+                stored[child] = stored[i] * entries[child][3]
+
+        for parent_id, tops in attached.items():
+            allocated = ExactSum()
+            total = ExactSum()
+            for top in tops:
+                created[top].parent = parent_id
+                subtree = []
+                stack = [top]
+                while stack:
+                    i = stack.pop()
+                    subtree.append(created[i])
+                    for child in reversed(children[i]):
+                        created[child].parent = ids[i]
+                        stack.append(child)
+                self._attach(parent_id, None, subtree)
+                self._rebuild_totals(ids[top])
+                allocated.add(created[top].allocated)
+                total.add(created[top].total)
+            self._propagate(parent_id, allocated.value(), total.value())
+        return ids
+
+    @recorded
+    def split(self, parent_id, heirs):
+        """Divide the share of parent_id among a family in one change.
+
+        heirs is a list of (depth, name, fraction) in the order written:
+        depth 0 for heirs of parent_id, and each deeper entry an heir of
+        the closest shallower one before it. fraction is the part of that
+        parent's share. Siblings given None divide equally whatever the
+        others leave, so a family with no fractions is split per stirpes.
+        Returns the new node ids.
+        """
+        groups = {}
+        parents = []
+        path = []
+        for line, (depth, name, fraction) in enumerate(heirs, start=1):
+            if depth > len(path):
+                raise LedgerError(f"Line {line}: {name} is indented past the heir above.")
+            del path[depth:]
+            parent = path[-1] if path else parent_id
+            parents.append(parent)
+            groups.setdefault(parent, []).append(line)
+            path.append(line)
+
+        fractions = [fraction for _, _, fraction in heirs]
+        for lines in groups.values():
+            unset = [line for line in lines if fractions[line - 1] is None]
+            if unset:
+                rest = 1 - exact_sum(Fraction(fractions[line - 1]) for line in lines if fractions[line - 1] is not None)
+                for line in unset:
+                    fractions[line - 1] = max(rest, Fraction(0)) / len(unset)
+
+        # Rows are keyed by line number, which cannot be mistaken for the
+        # string id of parent_id.
+        return self.import_rows(
+            (line, line, parents[line - 1], name, fractions[line - 1])
+            for line, (_, name, _) in enumerate(heirs, start=1)
+        )
+
+    def relative_share(self, node_id):
+        node = self.nodes[node_id]
+        if node.parent == self.ROOT:
+            return node.share
+        parent = self.nodes[node.parent]
+        parent_frame = self._frame(node.parent)
+        if parent.share * parent_frame == 0:
+            if node.share * parent.scale * parent_frame != 0:
+                raise LedgerError("Cannot edit heir of a parent with zero share.")
+            return Fraction(0)
+        return node.share * parent.scale / parent.share
+
+    @recorded
+    def edit(self, node_id, name, fraction):
+        """Rename a node and set its share relative to its parent.
+
+        Returns True when the node's old share was zero and its children
+        could not be rescaled automatically.
+        """
+        if fraction < 0:
+            raise LedgerError("Share cannot be negative.")
+        node = self.nodes[node_id]
+        if node.parent == self.ROOT:
+            new_share = fraction
+        else:
+            new_share = self.share(node.parent) * fraction
+            frame = self._frame(node_id)
+            if new_share and not frame:
+                self._unzero(node.parent)
+                frame = self._frame(node_id)
+            new_share = new_share / frame if frame else Fraction(0)
+
+        node = self._touch(node_id)
+        old_share = node.share
+        old_allocated = node.allocated
+        old_total = node.total
+        self._rename(node_id, name)
+        node.share = new_share
+        node.allocated = new_share
+
+        stale_children = False
+        if new_share == 0:
+            node.scale = Fraction(0)
+        elif old_share == 0:
+            stale_children = bool(node.children)
+        else:
+            node.scale *= new_share / old_share
+        self._refresh(node_id, old_allocated, old_total)
+        return stale_children
+
+    def _rename(self, node_id, name):
+        # A person has one name however many lines they inherit through.
+        for item in self.entity_nodes(node_id):
+            node = self._touch(item)
+            node.name = name
+            self.index.rename(item, name)
+
+    @recorded
+    def convey(self, source_id, conveyances):
+        source = self._touch(source_id)
+        old_total = source.total
+        source.share -= exact_sum(share for _, share in conveyances) / self._frame(source_id)
+        self._refresh(source_id, source.allocated, old_total)
+
+        for dest_id, share_to_convey in conveyances:
+            frame = self._frame(dest_id)
+            if frame == 0:
+                self._unzero(self.nodes[dest_id].parent)
+                frame = self._frame(dest_id)
+            dest = self._touch(dest_id)
+            old_total = dest.total
+            old_dest_share = dest.share
+            dest.share = old_dest_share + share_to_convey / frame
+            if old_dest_share != 0:
+                dest.scale *= dest.share / old_dest_share
+            self._refresh(dest_id, dest.allocated, old_total)
+
+    @recorded
+    def delete(self, node_id):
+        if self.referrers:
+            subtree = {node_id}
+            subtree.update(item for item, _ in self._preorder(node_id))
+            for item in subtree:
+                if any(ref not in subtree for ref in self.referrers.get(item, ())):
+                    raise LedgerError(f"{self.nodes[item].name} also inherits through another line. Delete those entries first.")
+        node = self._detach(node_id)[0]
+        self._propagate(node.parent, -node.allocated, -node.total)
+
+        if node.parent == self.ROOT:
+            self._update_original_owner_shares()
+
+    def _update_original_owner_shares(self):
+        original_owners = self.original_owners()
+        if not original_owners:
+            return
+
+        new_share = Fraction(1, len(original_owners))
+        for owner_id in original_owners:
+            owner = self._touch(owner_id)
+            old_share = owner.share
+            old_allocated = owner.allocated
+            old_total = owner.total
+            owner.share = new_share
+            owner.allocated = new_share
+            if old_share != 0:
+                owner.scale *= new_share / old_share
+            self._refresh(owner_id, old_allocated, old_total)
+
+    # Every traversal goes through these two generators, which keep their
+    # own stack, so chains of any depth stay within Python's recursion limit.
+    def _preorder(self, node_id, frame=None, child_frame=None):
+        """Yield (node_id, frame) for every node below node_id, parents
+        before children and siblings in order.
+
+        frame is what the children of node_id receive, and each node hands
+        child_frame(node, frame), by default frame times its scale, on to
+        its own children. Without a frame every frame yielded is None.
+        """
+        nodes = self.nodes
+        if node_id == self.ROOT and type(nodes) is LazyNodes:
+            # Cheaper in one read than a branch at a time.
+            nodes.load_all()
+        stack = [(child, frame) for child in reversed(nodes[node_id].children)]
+        while stack:
+            item, frame = stack.pop()
+            yield item, frame
+            node = nodes[item]
+            if node.children:
+                if frame is not None:
+                    frame = child_frame(node, frame) if child_frame else mul(frame, node.scale)
+                stack.extend([(child, frame) for child in reversed(node.children)])
+
+    def _postorder(self, node_id=ROOT):
+        """Yield node_id and every node below it, children before their
+        parent."""
+        nodes = self.nodes
+        if node_id == self.ROOT and type(nodes) is LazyNodes:
+            nodes.load_all()
+        stack = [(node_id, False)]
+        while stack:
+            item, expanded = stack.pop()
+            if expanded:
+                yield item
+                continue
+            stack.append((item, True))
+            stack.extend([(child, False) for child in reversed(nodes[item].children)])
+
+    def walk(self, node_id=ROOT):
+        """Yield (node_id, frame) for every node below node_id in tree order,
+        where frame converts that node's stored values to absolute ones."""
+        return self._preorder(node_id, mul(self._frame(node_id), self.nodes[node_id].scale))
+
+    def child_shares(self, node_id):
+        """Yield (node_id, name, share) for the direct children of node_id."""
+        node = self.nodes[node_id]
+        frame = self._frame(node_id) * node.scale
+        for child in node.children:
+            child_node = self.nodes[child]
+            yield child, child_node.name, mul(child_node.share, frame)
+
+    def subtree_shares(self, node_id):
+        """Yield (node_id, name, share) for node_id and its descendants."""
+        node = self.nodes[node_id]
+        yield node_id, node.name, self.share(node_id)
+        for item, frame in self.walk(node_id):
+            child = self.nodes[item]
+            yield item, child.name, mul(child.share, frame)
+
+    def _entity_shares(self):
+        """Return {person_id: (own, inherited)} for every person with
+        references: the share of their own entry and the total reaching
+        them through other lines, both after the adjustment for every
+        person above them (see _estate()).
+
+        Each person is worked out once and memoized, however many lines
+        lead to them. Raises LedgerError if a person would inherit from
+        their own estate.
+        """
+        nodes = self.nodes
+        referrers = self.referrers
+        shares = {}
+        inherited = {}
+        pending = set()
+
+        def people_above(node_id):
+            parent_id = nodes[node_id].parent
+            while parent_id is not None:
+                if parent_id in referrers:
+                    yield parent_id
+                parent_id = nodes[parent_id].parent
+
+        def line_share(node_id):
+            # The node's share with the adjustment for the people above it,
+            # worked out down the path from its original owner.
+            path = []
+            parent_id = nodes[node_id].parent
+            while parent_id != self.ROOT:
+                path.append(parent_id)
+                parent_id = nodes[parent_id].parent
+            frame = (nodes[self.ROOT].scale, Fraction(1))
+            for item in reversed(path):
+                frame = self._heirs_frame(nodes[item], frame, inherited)
+            return self._estate(nodes[node_id], frame, inherited)[1]
+
+        # Depth-first over people, with an explicit stack: a person is
+        # worked out once everyone above them, in their own line and in
+        # every line they inherit through, has been.
+        for start in referrers:
+            stack = [start]
+            while stack:
+                person_id = stack[-1]
+                if person_id in shares:
+                    stack.pop()
+                    continue
+                pending.add(person_id)
+                waiting = [other for item in (person_id, *referrers[person_id])
+                           for other in people_above(item) if other not in shares]
+                if waiting:
+                    for other in waiting:
+                        if other in pending:
+                            raise LedgerError(f"{nodes[other].name} cannot inherit from their own estate.")
+                    stack.extend(waiting)
+                    continue
+                own = line_share(person_id)
+                inherited[person_id] = exact_sum(line_share(ref) for ref in referrers[person_id])
+                shares[person_id] = (own, inherited[person_id])
+                pending.discard(person_id)
+                stack.pop()
+        return shares
+
+    @staticmethod
+    def _estate(node, frame, inherited):
+        """Return (share, estate) for node: its absolute share, and what
+        the person really holds once the growth of the estates above them
+        and what they inherit through other lines are added.
+
+        frame is (scale, gain) of the node's parent: scale turns stored
+        shares into absolute ones, and gain is how much the parent's
+        estate outgrew its share. The part of the node's share that came
+        down from the parent, its allocated share, grows by the same
+        ratio. Shares conveyed to the node from other lines do not.
+        """
+        scale, gain = frame
+        share = mul(node.share, scale)
+        estate = share + inherited.get(node.id, 0)
+        if gain != 1:
+            estate += mul(node.allocated, scale) * (gain - 1)
+        return share, estate
+
+    def _heirs_frame(self, node, frame, inherited):
+        # The frame node hands its heirs. A person with no share of their
+        # own has nothing to split what they inherit by, so keeps it.
+        share, estate = self._estate(node, frame, inherited)
+        return mul(frame[0], node.scale), estate / share if share else Fraction(1)
+
+    def claimants(self):
+        """Return (name, share) for everyone with an interest, one entry
+        per person however many lines they inherit through."""
+        return list(self.iter_claimants())
+
+    def iter_claimants(self):
+        """Yield claimants() one at a time, in tree order. The tree must not
+        change until the generator is done."""
+        if self.referrers:
+            inherited = {person_id: shares[1] for person_id, shares in self._entity_shares().items()}
+            yield from self._adjusted_claimants(inherited)
+            return
+
+        for item, frame in self._preorder(self.ROOT, Fraction(1)):
+            node = self.nodes[item]
+            if not node.children:
+                yield node.name, mul(node.share, frame)
+                continue
+            children_share = mul(node.scale, node.child_alloc)
+            if node.share > children_share and frame:
+                yield node.name, mul(node.share - children_share, frame)
+
+    def _adjusted_claimants(self, inherited):
+        # iter_claimants() for a tree in which people inherit through more
+        # than one line; see _estate().
+        child_frame = functools.partial(self._heirs_frame, inherited=inherited)
+        for item, frame in self._preorder(self.ROOT, (Fraction(1), Fraction(1)), child_frame):
+            node = self.nodes[item]
+            if node.ref is not None:
+                # Reported with the person's own entry.
+                continue
+            share, estate = self._estate(node, frame, inherited)
+            if not node.children:
+                yield node.name, estate
+                continue
+            children_share = mul(mul(node.scale, node.child_alloc), frame[0])
+            if not share:
+                if estate:
+                    yield node.name, estate
+            elif share > children_share:
+                yield node.name, (share - children_share) * estate / share
+
+    def total_share(self):
+        return self.nodes[self.ROOT].total
+
+    def over_allocated(self):
+        """Return the ids of the people whose heirs were given more than
+        their own share.
+
+        The first call checks every node. After that the ledger notes the
+        nodes each change touches, and only those are checked again.
+        """
+        nodes = self.nodes
+        if self._over is None:
+            self._over = {node.id for node in nodes.values() if node.parent is not None and node.over_allocated()}
+        elif self._unchecked:
+            over = self._over
+            for node_id in self._unchecked:
+                node = nodes.get(node_id)
+                if node is not None and node.parent is not None and node.over_allocated():
+                    over.add(node_id)
+                else:
+                    over.discard(node_id)
+        self._unchecked = set()
+        return set(self._over)
+
+    def search(self, query, limit=100, exclude=None):
+        """Return up to limit (name, node_id) pairs for the nodes whose
+        name or id has a word starting with every word of query, ordered
+        by name. An empty query gives the first nodes in tree order."""
+        if not self.index.built:
+            self.index.build((node.id, node.name) for node in self.nodes.values() if node.id != self.ROOT)
+        matches = self.index.search(query)
+        if matches is None:
+            found = (item for item, _ in self._preorder(self.ROOT) if item != exclude)
+            return [(self.nodes[item].name, item) for item in itertools.islice(found, limit)]
+        matches.discard(exclude)
+        names = self.index.names
+        found = heapq.nsmallest(limit, matches, key=lambda item: (names[item].casefold(), len(item), item))
+        return [(names[item], item) for item in found]
+
+    def records(self):
+        """Yield (node_id, parent_id, depth, name, share, allocated, ref) for
+        every node in depth-first order, with absolute shares."""
+        depth = {self.ROOT: -1}
+        for item, frame in self.walk():
+            node = self.nodes[item]
+            node_depth = depth[item] = depth[node.parent] + 1
+            yield (item, node.parent, node_depth, node.name,
+                   mul(node.share, frame), mul(node.allocated, frame), node.ref)
+
+    def stored_rows(self, node_ids=None):
+        """Yield (node_id, parent_id, children, state, ref) for node_ids, or
+        for every node including the root, as the ledger holds them:
+        state is Node.state(), with shares relative to the node's frame.
+
+        A store that keeps these rows saves an edit as the few rows it
+        touched, where absolute shares would change a whole subtree.
+        """
+        nodes = self.nodes
+        for node_id in nodes if node_ids is None else node_ids:
+            node = nodes[node_id]
+            yield node_id, node.parent, node.children, node.state(), node.ref
+
+    def take_unsaved(self):
+        """Return the ids in unsaved and start collecting them again from
+        nothing; see unsaved."""
+        unsaved = self.unsaved
+        self.unsaved = set()
+        return unsaved
+
+    def _hash_node(self, node, frame):
+        # The shares of the heirs are hashed as parts of the node's own
+        # share, so a node hashes the same whatever its frame and however
+        # its subtree was last rescaled. When the node has no share, there
+        # is nothing to take parts of, and their absolute shares are
+        # hashed instead; a conveyance can still give them some.
+        nodes = self.nodes
+        hashes = self._hashes
+        whole = mul(node.share, frame)
+        frame = mul(frame, node.scale)
+        digest = hashlib.blake2b(f"{node.id}\0{node.name}\0{node.ref}".encode(), digest_size=16)
+        for child_id in node.children:
+            child = nodes[child_id]
+            if whole:
+                share = mul(child.share, node.scale) / node.share
+                allocated = mul(child.allocated, node.scale) / node.share
+            else:
+                share = mul(child.share, frame)
+                allocated = mul(child.allocated, frame)
+            digest.update(f"\0{child_id}\0{share}\0{allocated}\0".encode())
+            digest.update(hashes[child_id])
+        return digest.digest()
+
+    def subtree_hash(self, node_id=ROOT):
+        """Return a hash of everything at and below node_id: names, ids and
+        each heir's part of their parent's share, or the heir's own share
+        under someone with none.
+
+        Hashes are kept until something below them changes, so after a
+        change only the nodes on the path to it are hashed again. A fork
+        starts with its parent's hashes.
+        """
+        hashes = self._hashes
+        if node_id in hashes:
+            return hashes[node_id]
+        nodes = self.nodes
+        stack = [(node_id, self._frame(node_id), False)]
+        while stack:
+            item, frame, ready = stack.pop()
+            node = nodes[item]
+            if ready:
+                hashes[item] = self._hash_node(node, frame)
+                continue
+            stack.append((item, frame, True))
+            child_frame = mul(frame, node.scale)
+            stack.extend([(child, child_frame, False) for child in node.children if child not in hashes])
+        return hashes[node_id]
+
+    def _claims(self, node_id, frame):
+        """Yield (name, claim) for node_id, whose frame is frame, and
+        everyone below it."""
+        node = self.nodes[node_id]
+        yield node.name, mul(node.claim(), frame)
+        for item, item_frame in self._preorder(node_id, mul(frame, node.scale)):
+            child = self.nodes[item]
+            yield child.name, mul(child.claim(), item_frame)
+
+    def diff(self, old):
+        """Return a TreeDiff of the changes from old, an earlier version of
+        this tree with the same node ids, to this ledger.
+
+        The two trees are walked together, and a branch whose subtree_hash()
+        and share are the same in both is skipped, so the work grows with
+        the part of the tree that changed. With references to people in
+        other lines, a change can move interests anywhere in the tree, so
+        the claimants are then compared in full.
+        """
+        result = TreeDiff()
+        old_nodes = old.nodes
+        nodes = self.nodes
+        references = bool(self.referrers or old.referrers)
+        changes = {}
+
+        def count(claims, sign):
+            if references:
+                return
+            for name, claim in claims:
+                if claim:
+                    changes.setdefault(name, ExactSum()).add(claim if sign > 0 else -claim)
+
+        def size(ledger, node_id):
+            return 1 + sum(1 for _ in ledger._preorder(node_id))
+
+        # Node, its frames and its parent's shares in the old and new trees.
+        stack = [(self.ROOT, Fraction(1), Fraction(1), Fraction(1), Fraction(1))]
+        while stack:
+            node_id, old_frame, frame, old_parent_share, parent_share = stack.pop()
+            before = old_nodes[node_id]
+            after = nodes[node_id]
+            result.compared += 1
+            old_share = mul(before.share, old_frame)
+            share = mul(after.share, frame)
+            same = old.subtree_hash(node_id) == self.subtree_hash(node_id)
+            if same and old_share == share and (share or node_id == self.ROOT):
+                continue
+            # Whether the node's part of its parent's share changed, rather
+            # than only the share coming down to it. Original owners hold
+            # parts of the whole.
+            if after.parent == self.ROOT:
+                moved = old_share != share
+            else:
+                moved = old_share * parent_share != share * old_parent_share
+            if same and old_share and share:
+                if moved:
+                    result.rescaled.append((node_id, after.name, old_share, share))
+                count(old._claims(node_id, old_frame), -1)
+                count(self._claims(node_id, frame), 1)
+                continue
+
+            if node_id != self.ROOT:
+                if before.name != after.name or before.ref != after.ref or moved:
+                    result.changed.append((node_id, before.name, after.name, old_share, share))
+                count([(before.name, mul(before.claim(), old_frame))], -1)
+                count([(after.name, mul(after.claim(), frame))], 1)
+
+            old_parent_share = old_share
+            parent_share = share
+            old_frame = mul(old_frame, before.scale)
+            frame = mul(frame, after.scale)
+            old_children = set(before.children)
+            children = set(after.children)
+            for child_id in before.children:
+                if child_id not in children:
+                    child = old_nodes[child_id]
+                    result.removed.append((child_id, node_id, child.name, mul(child.share, old_frame), size(old, child_id)))
+                    count(old._claims(child_id, old_frame), -1)
+            for child_id in after.children:
+                if child_id not in old_children:
+                    child = nodes[child_id]
+                    result.added.append((child_id, node_id, child.name, mul(child.share, frame), size(self, child_id)))
+                    count(self._claims(child_id, frame), 1)
+            stack.extend([(child_id, old_frame, frame, old_parent_share, parent_share)
+                          for child_id in reversed(after.children) if child_id in old_children])
+
+        if references:
+            for sign, claimants in ((-1, old.iter_claimants()), (1, self.iter_claimants())):
+                for name, claim in claimants:
+                    changes.setdefault(name, ExactSum()).add(claim if sign > 0 else -claim)
+        for name in sorted(changes):
+            change = changes[name].value()
+            if change:
+                result.claimants.append((name, change))
+        return result
+
+    def snapshot(self):
+        return [record_to_dict(record) for record in self.records()]
+
+    @recorded
+    def restore(self, data, progress=None):
+        total = len(data)
+
+        def rows():
+            for i, item in enumerate(data):
+                if progress and i % 1000 == 0:
+                    progress(i / total)
+                yield (item["id"], item["parent"], item["name"],
+                       Fraction(item["share"]), Fraction(item["allocated_share"]), item.get("ref"))
+
+        self.restore_rows(rows())
+        # Saved trees note the next id on their first node.
+        if data and "next_id" in data[0]:
+            self.reserve_ids(data[0]["next_id"])
+        if progress:
+            progress(1.0)
+
+    @recorded
+    def restore_rows(self, rows):
+        """Replace the tree with nodes from an iterable of
+        (node_id, parent_id, name, share, allocated[, ref]) tuples with
+        absolute shares, parents before children. rows may be a generator
+        that is still reading its source."""
+        nodes = {self.ROOT: Node(self.ROOT, None, "", Fraction(0), Fraction(0), owner=self._token)}
+        refs = []
+        last_id = 0
+        for row in rows:
+            node_id, parent_id, name, share, allocated = row[:5]
+            ref = row[5] if len(row) > 5 else None
+            parent_id = parent_id or self.ROOT
+            if parent_id not in nodes:
+                raise LedgerError(f"Unknown parent node: {parent_id}")
+            if node_id in nodes:
+                raise LedgerError(f"Duplicate node id: {node_id}")
+            if nodes[parent_id].ref is not None:
+                raise LedgerError(f"Reference node {parent_id} cannot have heirs.")
+            nodes[node_id] = Node(node_id, parent_id, name, share, allocated, ref, self._token)
+            nodes[parent_id].children.append(node_id)
+            if ref is not None:
+                refs.append(node_id)
+            if node_id[:1] == "N" and node_id[1:].isdigit():
+                last_id = max(last_id, int(node_id[1:]))
+        for node_id in refs:
+            ref = nodes[node_id].ref
+            if ref not in nodes or ref == self.ROOT or nodes[ref].ref is not None:
+                raise LedgerError(f"Node {node_id} refers to unknown person {ref}.")
+        self._replace(nodes)
+        self.reserve_ids(last_id + 1)
+        self._rebuild_totals()
+        if refs:
+            self._entity_shares()
+
+    @recorded
+    def adopt(self, other):
+        """Take over the nodes of another ledger, e.g. one built off the UI
+        thread, as a single undoable change. other must not be used after."""
+        self._replace(other.nodes)
+        self.reserve_ids(other.next_id)
+
+    def fork(self):
+        """Return a ledger holding the same tree that can be changed apart
+        from this one, e.g. to try out a what-if.
+
+        The two share every node until one of them changes it, and each
+        then copies only the nodes it changes, so a fork costs a table of
+        references rather than a second tree. The fork starts with no
+        undo history, and the two never give new nodes the same id, so
+        diff() can tell them apart.
+        """
+        if self._txn is not None:
+            raise LedgerError("Cannot fork in the middle of a change.")
+        other = ShareLedger(self.history.max_steps, self.history.max_changes)
+        other.nodes = dict(self.nodes)
+        other._ids = self._ids
+        other.referrers = {person_id: set(refs) for person_id, refs in self.referrers.items()}
+        if self._over is not None:
+            other._over = set(self._over)
+            other._unchecked = set(self._unchecked)
+        # The shared nodes hash the same in both.
+        other._hashes = dict(self._hashes)
+        # Neither ledger may change the shared nodes in place any more.
+        self._token = object()
+        return other
+
+    @classmethod
+    def from_snapshot(cls, data, progress=None):
+        ledger = cls()
+        ledger.restore(data, progress)
+        ledger.history.clear()
+        ledger.version = 0
+        return ledger
+
+    @classmethod
+    def from_rows(cls, rows):
+        ledger = cls()
+        ledger.restore_rows(rows)
+        ledger.history.clear()
+        ledger.version = 0
+        return ledger
+
+    @classmethod
+    def from_store(cls, fetch, fetch_all, size, next_id, referrers, over=None):
+        """Open a tree kept as stored_rows() in a store, reading nodes as
+        they are used (see LazyNodes). referrers is {person_id: set of
+        reference ids} for the whole tree, and over, when the store keeps
+        it, the ids over_allocated() would return. The ledger collects
+        unsaved ids from the start."""
+        ledger = cls()
+        ledger.nodes = LazyNodes(ledger, fetch, fetch_all, size)
+        ledger.reserve_ids(next_id)
+        ledger.referrers = referrers
+        ledger.unsaved = set()
+        if over is not None:
+            ledger._over = set(over)
+            ledger._unchecked = set()
+        return ledger
+
+
+def record_to_dict(record):
+    node_id, parent_id, _, name, share, allocated, ref = record
+    data = {
+        "id": node_id,
+        "parent": parent_id,
+        "name": name,
+        "share": str(share),
+        "allocated_share": str(allocated)
+    }
+    if ref is not None:
+        data["ref"] = ref
+    return data
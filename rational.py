@@ -0,0 +1,77 @@
+from fractions import Fraction
+import math
+
+# Above this many bits an unreduced product is normalized before going on,
+# so a long run of multiplies cannot grow without bound.
+NORMALIZE_BITS = 4096
+
+
+def product(values):
+    """Exact product of Fractions (or ints).
+
+    Numerators and denominators are multiplied as plain integers and
+    reduced once at the end, instead of taking a gcd after every multiply
+    as Fraction does. Factors of one are skipped.
+    """
+    num = den = 1
+    for value in values:
+        n = value.numerator
+        d = value.denominator
+        if n == d:
+            continue
+        if not n:
+            return Fraction(0)
+        num *= n
+        den *= d
+        if den.bit_length() > NORMALIZE_BITS:
+            g = math.gcd(num, den)
+            num //= g
+            den //= g
+    return Fraction(num, den)
+
+
+class ExactSum:
+    """Exact running sum of Fractions kept as integer numerators over
+    shared denominators.
+
+    Values with the same denominator, which is the usual case for the
+    shares of siblings, are added as plain integers. The buckets are
+    brought over their least common multiple and reduced only when
+    value() is called.
+    """
+
+    __slots__ = ("numerators",)
+
+    def __init__(self, values=()):
+        self.numerators = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        numerators = self.numerators
+        d = value.denominator
+        numerators[d] = numerators.get(d, 0) + value.numerator
+
+    def value(self):
+        numerators = self.numerators
+        if not numerators:
+            return Fraction(0)
+        if len(numerators) == 1:
+            (d, n), = numerators.items()
+            return Fraction(n, d)
+        common = math.lcm(*numerators)
+        return Fraction(sum(n * (common // d) for d, n in numerators.items()), common)
+
+
+def exact_sum(values):
+    return ExactSum(values).value()
+
+
+def mul(a, b):
+    """a * b, without the Fraction arithmetic when either side is one,
+    which is what most scales and frames in a tree are."""
+    if a == 1:
+        return b
+    if b == 1:
+        return a
+    return a * b
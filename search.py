@@ -0,0 +1,97 @@
+import bisect
+import re
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return WORD.findall(text.casefold())
+
+
+class NameIndex:
+    """Word index over node names for search-as-you-type.
+
+    Each casefolded word of a node's name, and its id, maps to the ids of
+    the nodes that contain it. The distinct words are also kept sorted so
+    a prefix is answered with a bisect instead of a scan. The index is
+    built on first use and then kept current by add(), remove() and
+    rename(); invalidate() drops it until it is needed again.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.names = {}
+        self.postings = {}
+        self.words = []
+
+    def invalidate(self):
+        self.built = False
+        self.names = {}
+        self.postings = {}
+        self.words = []
+
+    def build(self, items):
+        """Index an iterable of (node_id, name) pairs from scratch."""
+        self.invalidate()
+        postings = self.postings
+        for node_id, name in items:
+            self.names[node_id] = name
+            for word in self._words(node_id, name):
+                ids = postings.get(word)
+                if ids is None:
+                    postings[word] = {node_id}
+                else:
+                    ids.add(node_id)
+        self.words = sorted(postings)
+        self.built = True
+
+    @staticmethod
+    def _words(node_id, name):
+        words = set(tokenize(name))
+        words.add(node_id.casefold())
+        return words
+
+    def add(self, node_id, name):
+        if not self.built:
+            return
+        self.names[node_id] = name
+        for word in self._words(node_id, name):
+            ids = self.postings.get(word)
+            if ids is None:
+                self.postings[word] = {node_id}
+                bisect.insort(self.words, word)
+            else:
+                ids.add(node_id)
+
+    def remove(self, node_id):
+        if not self.built:
+            return
+        name = self.names.pop(node_id)
+        for word in self._words(node_id, name):
+            ids = self.postings[word]
+            ids.discard(node_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+
+    def rename(self, node_id, name):
+        if self.built and node_id in self.names and self.names[node_id] != name:
+            self.remove(node_id)
+            self.add(node_id, name)
+
+    def search(self, query):
+        """Return the set of ids with a word starting with each word of
+        query, or None when query has no words."""
+        candidates = None
+        words = self.words
+        # Longer words usually match fewer nodes, so they go first.
+        for prefix in sorted(set(tokenize(query)), key=len, reverse=True):
+            matches = set()
+            i = bisect.bisect_left(words, prefix)
+            while i < len(words) and words[i].startswith(prefix):
+                matches |= self.postings[words[i]]
+                i += 1
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+        return candidates
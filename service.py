@@ -0,0 +1,541 @@
+"""Local JSON-RPC service over the share engine.
+
+Other programs on the same machine, such as a land-management system,
+can open the saved trees in one folder and change or report them without
+the window. Requests and responses are JSON-RPC 2.0 objects, one per
+line, over a loopback TCP port or a Unix socket. Shares are sent as
+fraction strings such as "1/3".
+
+A connection may send many requests without waiting for the answers,
+which come back as each finishes, matched by id. Requests for one tree
+run one at a time in the order they arrive, while different trees are
+worked on side by side. The most recently used trees stay loaded.
+Changes are written back to the tree's file every few seconds, when the
+tree is dropped from memory and when the service stops.
+"""
+import asyncio
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from fractions import Fraction
+
+from ledger import LedgerError, ShareLedger
+from rational import exact_sum
+from storage import TREE_EXTENSIONS, load_ledger, save_ledger
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_HOT_TREES = 32
+FLUSH_INTERVAL = 5.0
+# Longest request line accepted, in bytes.
+MAX_REQUEST_SIZE = 16 << 20
+
+# JSON-RPC error codes; the last two are this service's own.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+LEDGER_ERROR = -32000
+TREE_ERROR = -32001
+
+
+class ServiceError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def parse_fraction(value, label="share"):
+    # The same checks the dialogs make, with JSON numbers allowed too.
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ServiceError(INVALID_PARAMS, f"Invalid fraction format for {label}. Please use 'numerator/denominator'.")
+    try:
+        fraction = Fraction(str(value))
+    except (ValueError, ZeroDivisionError):
+        raise ServiceError(INVALID_PARAMS, f"Invalid fraction format for {label}. Please use 'numerator/denominator'.")
+    if fraction < 0:
+        raise ServiceError(INVALID_PARAMS, "Share cannot be negative.")
+    return fraction
+
+
+def parse_name(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ServiceError(INVALID_PARAMS, "Please enter a name.")
+    return value.strip()
+
+
+def require_node(ledger, node_id):
+    if not isinstance(node_id, str) or node_id not in ledger:
+        raise ServiceError(INVALID_PARAMS, f"Unknown node: {node_id}")
+    return node_id
+
+
+def share_fields(share):
+    return {"share": str(share), "percentage": f"{float(share) * 100:.8f}"}
+
+
+class HotTree:
+    def __init__(self, path, ledger, saved_version):
+        self.path = path
+        self.ledger = ledger
+        self.saved_version = saved_version
+
+    @property
+    def dirty(self):
+        return self.ledger.version != self.saved_version
+
+    def save(self):
+        version = self.ledger.version
+        save_ledger(self.path, list(self.ledger.records()), next_id=self.ledger.next_id)
+        self.saved_version = version
+
+
+class TreeService:
+    """The trees of one folder and the methods that act on them.
+
+    Each rpc_<method> coroutine answers the JSON-RPC method of that name.
+    A tree is named by its file name in the folder, e.g. "north.json".
+    Ledger work runs on worker threads, under a lock per tree, so a large
+    tree being loaded or reported does not hold up the others.
+    """
+
+    def __init__(self, root, max_trees=MAX_HOT_TREES, flush_interval=FLUSH_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.max_trees = max_trees
+        self.flush_interval = flush_interval
+        # Tree name -> HotTree, least recently used first.
+        self.trees = OrderedDict()
+        self.locks = {}
+        self.started = time.time()
+        self.requests = 0
+
+    def tree_path(self, tree):
+        if (not isinstance(tree, str) or os.path.basename(tree) != tree or tree.startswith(".")
+                or not tree.lower().endswith(TREE_EXTENSIONS) or ".autosave." in tree):
+            raise ServiceError(INVALID_PARAMS, f"Invalid tree name: {tree!r}. Use a .json or .vest file name in {self.root}.")
+        return os.path.join(self.root, tree)
+
+    async def run(self, tree, work, create=False):
+        """Call work(ledger) on a worker thread while holding the tree's
+        lock, loading the tree first if it is not in memory."""
+        path = self.tree_path(tree)
+        lock = self.locks.setdefault(tree, asyncio.Lock())
+        async with lock:
+            entry = self.trees.get(tree)
+            if entry is None:
+                entry = await asyncio.to_thread(self._load, path, create)
+                self.trees[tree] = entry
+            elif create:
+                raise ServiceError(TREE_ERROR, f"{tree} already exists.")
+            self.trees.move_to_end(tree)
+            result = await asyncio.to_thread(work, entry.ledger)
+        await self.evict()
+        return result
+
+    def _load(self, path, create):
+        if create:
+            if os.path.exists(path):
+                raise ServiceError(TREE_ERROR, f"{os.path.basename(path)} already exists.")
+            entry = HotTree(path, ShareLedger(), -1)
+            entry.save()
+            return entry
+        try:
+            ledger = load_ledger(path)
+        except FileNotFoundError:
+            raise ServiceError(TREE_ERROR, f"No tree named {os.path.basename(path)}.")
+        except Exception as e:
+            raise ServiceError(TREE_ERROR, f"Failed to load {os.path.basename(path)}: {e}")
+        return HotTree(path, ledger, ledger.version)
+
+    async def evict(self):
+        """Drop the least recently used trees beyond max_trees, saving any
+        changes first. Trees in use are kept."""
+        for tree in list(self.trees):
+            if len(self.trees) <= self.max_trees:
+                break
+            lock = self.locks[tree]
+            if lock.locked():
+                continue
+            async with lock:
+                entry = self.trees.get(tree)
+                if entry is None:
+                    continue
+                if entry.dirty:
+                    await asyncio.to_thread(entry.save)
+                del self.trees[tree]
+
+    async def flush(self):
+        """Save every loaded tree with unsaved changes. Returns how many
+        were saved."""
+        saved = 0
+        for tree in list(self.trees):
+            async with self.locks[tree]:
+                entry = self.trees.get(tree)
+                if entry is not None and entry.dirty:
+                    await asyncio.to_thread(entry.save)
+                    saved += 1
+        return saved
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except OSError:
+                # Kept in memory and tried again next time.
+                pass
+
+    async def call(self, method, params):
+        handler = getattr(self, "rpc_" + method, None) if isinstance(method, str) else None
+        if handler is None:
+            raise ServiceError(METHOD_NOT_FOUND, f"Unknown method: {method}")
+        if params is None:
+            params = {}
+        if not isinstance(params, dict):
+            raise ServiceError(INVALID_PARAMS, "Parameters must be given by name.")
+        try:
+            inspect.signature(handler).bind(**params)
+        except TypeError as e:
+            raise ServiceError(INVALID_PARAMS, str(e))
+        self.requests += 1
+        return await handler(**params)
+
+    async def handle(self, request):
+        """Answer one decoded JSON-RPC request. Returns the response, or
+        None for a notification."""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or "method" not in request:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "Invalid request."}}
+        request_id = request.get("id")
+        try:
+            result = await self.call(request["method"], request.get("params"))
+        except ServiceError as e:
+            error = {"code": e.code, "message": str(e)}
+        except LedgerError as e:
+            error = {"code": LEDGER_ERROR, "message": str(e)}
+        except Exception as e:
+            error = {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}
+        else:
+            if "id" not in request:
+                return None
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+    async def respond(self, line, writer):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error."}}
+        else:
+            response = await self.handle(request)
+        if response is not None and not writer.is_closing():
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def serve_connection(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(json.dumps({"jsonrpc": "2.0", "id": None, "error": {
+                        "code": INVALID_REQUEST, "message": "Request too large."}}).encode("utf-8") + b"\n")
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.respond(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except asyncio.CancelledError:
+            # The service is stopping. Requests already started finish
+            # before the trees are saved.
+            pass
+        finally:
+            writer.close()
+
+    # Methods
+
+    async def rpc_status(self):
+        return {
+            "root": self.root,
+            "loaded": list(self.trees),
+            "unsaved": [tree for tree, entry in self.trees.items() if entry.dirty],
+            "requests": self.requests,
+            "uptime": time.time() - self.started,
+        }
+
+    async def rpc_list_trees(self):
+        names = await asyncio.to_thread(os.listdir, self.root)
+        return sorted(
+            name for name in names
+            if name.lower().endswith(TREE_EXTENSIONS) and ".autosave." not in name and not name.startswith(".")
+        )
+
+    def _summary(self, tree, ledger):
+        total_share = ledger.total_share()
+        return {
+            "tree": tree,
+            "people": len(ledger),
+            "version": ledger.version,
+            "total_share": str(total_share),
+            "total_percentage": f"{float(total_share) * 100:.8f}",
+        }
+
+    async def rpc_open(self, tree):
+        return await self.run(tree, lambda ledger: self._summary(tree, ledger))
+
+    async def rpc_create(self, tree):
+        return await self.run(tree, lambda ledger: self._summary(tree, ledger), create=True)
+
+    async def rpc_save(self, tree):
+        path = self.tree_path(tree)
+        async with self.locks.setdefault(tree, asyncio.Lock()):
+            entry = self.trees.get(tree)
+            if entry is None or not entry.dirty:
+                return {"saved": False}
+            await asyncio.to_thread(entry.save)
+        return {"saved": True, "path": path}
+
+    async def rpc_close(self, tree):
+        self.tree_path(tree)
+        async with self.locks.setdefault(tree, asyncio.Lock()):
+            entry = self.trees.pop(tree, None)
+            if entry is not None and entry.dirty:
+                try:
+                    await asyncio.to_thread(entry.save)
+                except BaseException:
+                    self.trees[tree] = entry
+                    raise
+        return {"closed": entry is not None}
+
+    async def rpc_children(self, tree, node=None):
+        """Direct heirs of node, or the original owners without one."""
+        def work(ledger):
+            parent = ShareLedger.ROOT if node is None else require_node(ledger, node)
+            return [
+                {"id": item, "name": name, **share_fields(share),
+                 "heirs": len(ledger.children(item)), "ref": ledger.reference(item)}
+                for item, name, share in ledger.child_shares(parent)
+            ]
+        return await self.run(tree, work)
+
+    async def rpc_node(self, tree, node):
+        def work(ledger):
+            require_node(ledger, node)
+            return {
+                "id": node,
+                "name": ledger.name(node),
+                "parent": ledger.parent(node) or None,
+                **share_fields(ledger.share(node)),
+                "remainder": str(ledger.remainder(node)),
+                "heirs": list(ledger.children(node)),
+                "ref": ledger.reference(node),
+            }
+        return await self.run(tree, work)
+
+    async def rpc_search(self, tree, query, limit=100):
+        if not isinstance(query, str) or not isinstance(limit, int) or limit < 1:
+            raise ServiceError(INVALID_PARAMS, "query must be text and limit a positive number.")
+        return await self.run(tree, lambda ledger: [
+            {"id": item, "name": name} for name, item in ledger.search(query, limit)
+        ])
+
+    async def rpc_add_owner(self, tree, name, share):
+        name = parse_name(name)
+        share = parse_fraction(share)
+        return await self.run(tree, lambda ledger: {"id": ledger.add_original_owner(name, share), "version": ledger.version})
+
+    async def rpc_add_heir(self, tree, parent, name, fraction):
+        """Add name as an heir of parent with fraction of the parent's share."""
+        name = parse_name(name)
+        fraction = parse_fraction(fraction)
+        # The Add Heir dialog adds no one for a fraction of 0.
+        if not fraction:
+            raise ServiceError(INVALID_PARAMS, "An heir's fraction must be more than 0.")
+
+        def work(ledger):
+            require_node(ledger, parent)
+            return {"id": ledger.add_heir(parent, name, fraction), "version": ledger.version}
+        return await self.run(tree, work)
+
+    async def rpc_convey(self, tree, source, recipients):
+        """Convey parts of source's remainder. recipients is a list of
+        [node, portion] pairs, where the portions of the remainder add up
+        to at most 1, as in the Convey Share dialog."""
+        if not isinstance(recipients, list) or not recipients or not all(
+                isinstance(pair, list) and len(pair) == 2 for pair in recipients):
+            raise ServiceError(INVALID_PARAMS, "recipients must be a list of [node, portion] pairs.")
+        portions = [(dest, parse_fraction(portion, dest)) for dest, portion in recipients]
+        if exact_sum(portion for _, portion in portions) > 1:
+            raise ServiceError(INVALID_PARAMS, "Total portion of remainder cannot exceed 1.")
+
+        def work(ledger):
+            require_node(ledger, source)
+            for dest, _ in portions:
+                if require_node(ledger, dest) == source:
+                    raise ServiceError(INVALID_PARAMS, "A node cannot convey to itself.")
+            remainder = ledger.remainder(source)
+            if remainder <= 0:
+                raise ServiceError(LEDGER_ERROR, "Source node has no remainder to convey.")
+            ledger.convey(source, [(dest, remainder * portion) for dest, portion in portions])
+            return {"version": ledger.version}
+        return await self.run(tree, work)
+
+    async def rpc_edit(self, tree, node, name=None, fraction=None):
+        """Rename node and/or set its share relative to its parent. Either
+        may be left out to keep it as it is."""
+        name = None if name is None else parse_name(name)
+        fraction = None if fraction is None else parse_fraction(fraction)
+
+        def work(ledger):
+            require_node(ledger, node)
+            share = ledger.relative_share(node) if fraction is None else fraction
+            stale = ledger.edit(node, ledger.name(node) if name is None else name, share)
+            return {"stale_children": stale, "version": ledger.version}
+        return await self.run(tree, work)
+
+    async def rpc_delete(self, tree, node):
+        def work(ledger):
+            ledger.delete(require_node(ledger, node))
+            return {"version": ledger.version}
+        return await self.run(tree, work)
+
+    async def rpc_undo(self, tree):
+        def work(ledger):
+            if not ledger.can_undo():
+                raise ServiceError(LEDGER_ERROR, "Nothing to undo.")
+            ledger.undo()
+            return {"version": ledger.version}
+        return await self.run(tree, work)
+
+    async def rpc_redo(self, tree):
+        def work(ledger):
+            if not ledger.can_redo():
+                raise ServiceError(LEDGER_ERROR, "Nothing to redo.")
+            ledger.redo()
+            return {"version": ledger.version}
+        return await self.run(tree, work)
+
+    async def rpc_report(self, tree):
+        """Claimants and their shares, as in the Generate Report window."""
+        def work(ledger):
+            claimants = ledger.claimants()
+            total_share = exact_sum(share for _, share in claimants)
+            return {
+                "tree": tree,
+                "claimants": [{"name": name, **share_fields(share)} for name, share in claimants],
+                "total_share": str(total_share),
+                "total_percentage": f"{float(total_share) * 100:.8f}",
+            }
+        return await self.run(tree, work)
+
+
+async def start_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+    """Start listening for connections to service, on a Unix socket at
+    path if given, else on host and port. Port 0 picks a free port."""
+    if path is not None:
+        return await asyncio.start_unix_server(service.serve_connection, path, limit=MAX_REQUEST_SIZE)
+    return await asyncio.start_server(service.serve_connection, host, port, limit=MAX_REQUEST_SIZE)
+
+
+async def serve(root, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, max_trees=MAX_HOT_TREES, ready=None):
+    """Run the service until cancelled, then save every changed tree."""
+    service = TreeService(root, max_trees)
+    server = await start_server(service, host, port, path)
+    flusher = asyncio.create_task(service.flush_periodically())
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        flusher.cancel()
+        await service.flush()
+
+
+class ServiceClient:
+    """Client for the service, e.g. for scripts and tests:
+
+        client = await ServiceClient.connect(port=port)
+        tree = await client.call("open", tree="north.json")
+        await client.close()
+
+    Calls may be awaited side by side on one connection.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.next_id = 1
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_REQUEST_SIZE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_REQUEST_SIZE)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        error = ConnectionError("Connection to the service was closed.")
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(ServiceError(response["error"]["code"], response["error"]["message"]))
+                else:
+                    future.set_result(response.get("result"))
+        except (ConnectionError, ValueError) as e:
+            error = e
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+
+    async def call(self, method, **params):
+        """Call method and return its result, raising ServiceError if the
+        service answers with an error."""
+        if self.receiver.done():
+            raise ConnectionError("Connection to the service was closed.")
+        request_id = self.next_id
+        self.next_id += 1
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        request = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        self.writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self.receiver.cancel()
+        try:
+            await self.receiver
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,336 @@
+import csv
+import io
+import json
+import os
+import textwrap
+import threading
+import zlib
+
+from fractions import Fraction
+
+from ledger import ShareLedger, LedgerError, record_to_dict
+
+PROGRESS_EVERY = 1000
+READ_CHUNK_SIZE = 1 << 20
+
+COMPACT_FORMAT = "vest-compact"
+COMPACT_VERSION = 2
+COMPACT_EXTENSION = ".vest"
+TREE_EXTENSIONS = (".json", COMPACT_EXTENSION)
+
+# Header names accepted for each column of an import, casefolded.
+IMPORT_COLUMNS = {
+    "id": ("id", "key", "no", "number"),
+    "parent": ("parent", "parent id", "parent_id", "heir of"),
+    "name": ("name", "heir", "person"),
+    "share": ("share", "fraction", "interest"),
+}
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Progress:
+    """Progress and cancellation shared between a worker thread and the UI.
+
+    The worker reports through update() or a callback from stage(); the UI
+    thread only reads fraction and message, and may call cancel(), which
+    makes the worker's next report raise Cancelled.
+    """
+
+    def __init__(self):
+        self.fraction = 0.0
+        self.message = ""
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def update(self, fraction, message=None):
+        if self._cancelled.is_set():
+            raise Cancelled()
+        self.fraction = fraction
+        if message is not None:
+            self.message = message
+
+    def stage(self, start, end, message=None):
+        """Return a callback mapping 0..1 onto start..end of this progress."""
+        def report(fraction):
+            self.update(start + (end - start) * fraction, message)
+        return report
+
+
+def atomic_write(path, write, mode="w", **open_args):
+    """Call write(f) on a temporary file and move it over path when done,
+    so a failed or cancelled save leaves the old file untouched."""
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".vest-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **open_args) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(path, data, progress=None):
+    # Same layout as json.dump(data, f, indent=4), written node by node so
+    # progress can be reported and the save cancelled part way.
+    def write(f):
+        if not data:
+            f.write("[]")
+            return
+        f.write("[\n")
+        total = len(data)
+        for i, node in enumerate(data):
+            if i:
+                f.write(",\n")
+            f.write(textwrap.indent(json.dumps(node, indent=4), "    "))
+            if progress and i % PROGRESS_EVERY == 0:
+                progress(i / total)
+        f.write("\n]")
+        if progress:
+            progress(1.0)
+
+    atomic_write(path, write)
+
+
+def read_json(path, progress=None):
+    size = os.path.getsize(path) or 1
+    chunks = []
+    read = 0
+    with open(path, 'r') as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            read += len(chunk)
+            if progress:
+                progress(min(read / size, 1.0))
+    return json.loads("".join(chunks))
+
+
+# The compact format is UTF-8 JSON Lines. The first line is a header
+#   {"format": "vest-compact", "version": 1, "nodes": <count>, "next_id": <n>}
+# and every further line is one node in depth-first order:
+#   [depth, id, name, share_num, share_den]
+#   [depth, id, name, share_num, share_den, allocated_num, allocated_den]
+#   [depth, id, name, share_num, share_den, allocated_num, allocated_den, ref]
+# The allocated columns are left out when they equal the share and the
+# node is not a reference to another person's entry (version 2). The
+# parent is the closest preceding node one level up. A name is written
+# out the first time it appears and afterwards as its index in the
+# order of first appearance, so repeated heirs cost a few bytes each.
+# next_id, when present, is ShareLedger.next_id, so that a reloaded tree
+# does not hand a deleted node's id to a new one.
+def write_compact(path, records, progress=None, next_id=None):
+    atomic_write(path, lambda f: dump_compact(f, records, progress, next_id), encoding="utf-8", newline="\n")
+
+
+def dump_compact(f, records, progress=None, next_id=None):
+    total = len(records)
+    # Files without references stay readable by version 1 readers.
+    version = COMPACT_VERSION if any(record[6] is not None for record in records) else 1
+    header = {"format": COMPACT_FORMAT, "version": version, "nodes": total}
+    if next_id is not None:
+        header["next_id"] = next_id
+    f.write(json.dumps(header) + "\n")
+    names = {}
+    for i, (node_id, _, depth, name, share, allocated, person_id) in enumerate(records):
+        ref = names.get(name)
+        if ref is None:
+            names[name] = len(names)
+            ref = name
+        row = [depth, node_id, ref, share.numerator, share.denominator]
+        if allocated != share or person_id is not None:
+            row += [allocated.numerator, allocated.denominator]
+        if person_id is not None:
+            row.append(person_id)
+        f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n")
+        if progress and i % PROGRESS_EVERY == 0:
+            progress(i / total)
+    if progress:
+        progress(1.0)
+
+
+def iter_compact(f, size=None, progress=None, header=None):
+    """Parse an open binary compact file into restore_rows() tuples.
+
+    Rows are yielded as soon as their line has been read, so the ledger
+    is being built while the rest of the file is still on disk. The
+    header line is copied into the header dict, if one is given.
+    """
+    fields = json.loads(f.readline() or "{}")
+    if fields.get("format") != COMPACT_FORMAT:
+        raise LedgerError("Not a compact tree file.")
+    if fields.get("version", 0) > COMPACT_VERSION:
+        raise LedgerError(f"Unsupported compact tree file version: {fields['version']}")
+    if header is not None:
+        header.update(fields)
+
+    names = []
+    path = []
+    read = 0
+    for line_number, line in enumerate(f, start=2):
+        read += len(line)
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        depth, node_id, ref, share_num, share_den = row[:5]
+        if isinstance(ref, str):
+            names.append(ref)
+            name = ref
+        else:
+            name = names[ref]
+        share = Fraction(share_num, share_den)
+        allocated = Fraction(row[5], row[6]) if len(row) > 5 else share
+        person_id = row[7] if len(row) > 7 else None
+
+        if depth > len(path):
+            raise LedgerError(f"Line {line_number}: node {node_id} has no parent.")
+        del path[depth:]
+        parent_id = path[-1] if path else ShareLedger.ROOT
+        path.append(node_id)
+        yield node_id, parent_id, name, share, allocated, person_id
+
+        if progress and size and line_number % PROGRESS_EVERY == 0:
+            progress(min(read / size, 1.0))
+
+
+def load_compact(f, size=None, progress=None):
+    """Build a ledger from an open binary compact file."""
+    header = {}
+    ledger = ShareLedger.from_rows(iter_compact(f, size, progress, header))
+    ledger.reserve_ids(header.get("next_id", 1))
+    return ledger
+
+
+def read_compact(path, progress=None):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        ledger = load_compact(f, size, progress)
+    if progress:
+        progress(1.0)
+    return ledger
+
+
+def pack_ledger(ledger):
+    """Return the tree as compressed compact-format bytes, a small
+    stand-in for a ledger that is not in use."""
+    buffer = io.StringIO()
+    dump_compact(buffer, list(ledger.records()))
+    return zlib.compress(buffer.getvalue().encode("utf-8"), 1)
+
+
+def unpack_ledger(data):
+    return load_compact(io.BytesIO(zlib.decompress(data)))
+
+
+def read_import_csv(path, progress=None):
+    """Read a spreadsheet export into ShareLedger.import_rows() tuples.
+
+    The first row names the columns: name and share are required, id
+    and parent optional, and any others are ignored. Comma, semicolon
+    and tab separated files are all accepted.
+    """
+    try:
+        with open(path, 'r', encoding="utf-8-sig", newline="") as f:
+            text = f.read()
+    except UnicodeDecodeError:
+        # Excel on Windows saves CSV in the ANSI code page.
+        with open(path, 'r', encoding="cp1252", newline="") as f:
+            text = f.read()
+    try:
+        dialect = csv.Sniffer().sniff(text[:READ_CHUNK_SIZE], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(io.StringIO(text), dialect)
+    header = [cell.strip().casefold() for cell in next(reader, [])]
+    columns = {}
+    for column, names in IMPORT_COLUMNS.items():
+        columns[column] = next((i for i, cell in enumerate(header) if cell in names), None)
+    if columns["name"] is None or columns["share"] is None:
+        raise LedgerError("The first row must name a name column and a share column.")
+
+    total = text.count("\n") or 1
+    rows = []
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        cells = {
+            column: row[i].strip() if i is not None and i < len(row) else ""
+            for column, i in columns.items()
+        }
+        rows.append((reader.line_num, cells["id"], cells["parent"], cells["name"], cells["share"]))
+        if progress and len(rows) % PROGRESS_EVERY == 0:
+            progress(min(reader.line_num / total, 1.0))
+    if progress:
+        progress(1.0)
+    return rows
+
+
+def export_claimants(path, claimants):
+    """Write (name, share) pairs to path as they are produced: CSV, or one
+    JSON object per line for a .jsonl path. Returns the number written."""
+    lines = path.lower().endswith(".jsonl")
+    count = 0
+
+    def write(f):
+        nonlocal count
+        writer = None if lines else csv.writer(f)
+        if writer:
+            writer.writerow(["claimant", "share", "percentage"])
+        for name, share in claimants:
+            percentage = f"{float(share) * 100:.8f}"
+            if writer:
+                writer.writerow((name, str(share), percentage))
+            else:
+                f.write(json.dumps({"claimant": name, "share": str(share), "percentage": percentage}) + "\n")
+            count += 1
+
+    atomic_write(path, write, newline="", encoding="utf-8")
+    return count
+
+
+def is_compact(path):
+    with open(path, 'rb') as f:
+        return f.read(64).lstrip().startswith(b"{")
+
+
+def load_ledger(path, progress=None):
+    """Load a tree from either the compact format or the indented JSON
+    list, whichever the file contains."""
+    if is_compact(path):
+        return read_compact(path, progress.stage(0.0, 1.0, "Reading tree...") if progress else None)
+    if progress is None:
+        return ShareLedger.from_snapshot(read_json(path))
+    data = read_json(path, progress.stage(0.0, 0.5, "Reading file..."))
+    return ShareLedger.from_snapshot(data, progress.stage(0.5, 1.0, "Building tree..."))
+
+
+def save_ledger(path, records, progress=None, next_id=None):
+    """Save ShareLedger.records() output; a .vest path gets the compact
+    format and anything else the indented JSON list. next_id is the
+    ledger's, kept in the compact header or on the first JSON node so
+    that a deleted node's id is not handed out again after a reload."""
+    stage = progress.stage(0.0, 1.0, "Writing file...") if progress else None
+    if path.lower().endswith(COMPACT_EXTENSION):
+        write_compact(path, records, stage, next_id)
+    else:
+        data = [record_to_dict(record) for record in records]
+        if data and next_id is not None:
+            data[0]["next_id"] = next_id
+        write_json(path, data, stage)
@@ -0,0 +1,237 @@
+"""Trees kept in a SQLite database, saved a few rows at a time.
+
+A store file (.vestdb) holds any number of named trees. Each node is one
+row in the form the ledger keeps it, with shares relative to the node's
+frame, so saving after an edit writes only the rows the edit touched, in
+one transaction. A tree opened from a store reads its nodes as they are
+used, through the (tree_id, parent_id) index, so the top of a large tree
+shows at once and each branch is read when it is opened.
+"""
+import json
+import sqlite3
+import time
+import weakref
+from fractions import Fraction
+
+from ledger import REPLACED, LedgerError, ShareLedger
+
+STORE_EXTENSION = ".vestdb"
+SCHEMA_VERSION = 2
+# Rows read at once when a node is first looked up: all its siblings, and
+# as many of their descendants, nearest first, as fit.
+FETCH_ROWS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trees (
+    tree_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    next_id INTEGER NOT NULL,
+    saved TEXT
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    tree_id INTEGER NOT NULL REFERENCES trees (tree_id) ON DELETE CASCADE,
+    node_id TEXT NOT NULL,
+    parent_id TEXT,
+    name TEXT NOT NULL,
+    ref TEXT,
+    children TEXT NOT NULL,
+    state TEXT NOT NULL,
+    over_allocated INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tree_id, node_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS nodes_by_parent ON nodes (tree_id, parent_id);
+CREATE INDEX IF NOT EXISTS nodes_by_ref ON nodes (tree_id, ref) WHERE ref IS NOT NULL;
+CREATE INDEX IF NOT EXISTS nodes_over_allocated ON nodes (tree_id) WHERE over_allocated;
+"""
+
+COLUMNS = "node_id, parent_id, name, ref, children, state"
+
+# Without statistics SQLite would rather scan the tree's primary key.
+CHILDREN = f"SELECT {COLUMNS} FROM nodes INDEXED BY nodes_by_parent WHERE tree_id = :tree AND parent_id = :parent"
+
+# Breadth first below the children of :parent, up to :limit rows.
+DESCENDANTS = f"""
+WITH RECURSIVE below (node_id) AS (
+    SELECT node_id FROM nodes WHERE tree_id = :tree AND parent_id IN (
+        SELECT node_id FROM nodes WHERE tree_id = :tree AND parent_id = :parent)
+    UNION ALL
+    SELECT nodes.node_id FROM nodes JOIN below ON nodes.tree_id = :tree AND nodes.parent_id = below.node_id
+    LIMIT :limit
+)
+SELECT {', '.join('nodes.' + column for column in COLUMNS.split(', '))}
+FROM below JOIN nodes ON nodes.tree_id = :tree AND nodes.node_id = below.node_id
+"""
+
+
+def is_over_allocated(parent_id, state):
+    # As Node.over_allocated(), from a stored state.
+    _, share, _, scale, child_alloc = state[:5]
+    return parent_id is not None and scale * child_alloc > share
+
+
+def encode_row(tree_id, row):
+    node_id, parent_id, children, state, ref = row
+    name, *values = state
+    numbers = []
+    for value in values:
+        numbers += (value.numerator, value.denominator)
+    return (tree_id, node_id, parent_id, name, ref,
+            json.dumps(children, separators=(",", ":")), json.dumps(numbers, separators=(",", ":")),
+            int(is_over_allocated(parent_id, state)))
+
+
+def decode_rows(rows):
+    # Siblings usually hold the same shares, so each distinct state is
+    # parsed once.
+    states = {}
+    decoded = []
+    for node_id, parent_id, name, ref, children, state in rows:
+        values = states.get(state)
+        if values is None:
+            numbers = json.loads(state)
+            values = states[state] = tuple(Fraction(numbers[i], numbers[i + 1]) for i in range(0, len(numbers), 2))
+        decoded.append((node_id, parent_id, json.loads(children) if children != "[]" else [], (name, *values), ref))
+    return decoded
+
+
+class TreeStore:
+    """A store file, opened or created at path.
+
+    A ledger opened from the store, or saved to it, remembers which tree
+    it belongs to, and its next save() there writes only what changed.
+    Saving any other ledger under a name replaces that tree. A tree should
+    be open in one place at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # The application saves on a worker thread while the UI waits, so
+        # the connection is used from more than one thread, though never
+        # from two at once.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        # Commits then cost no more than the rows they write.
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            self.connection.close()
+            raise LedgerError(f"Unsupported tree database version: {version}")
+        if version == 1:
+            self._add_over_allocated()
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        # Ledger -> name of the tree it holds here.
+        self.bound = weakref.WeakKeyDictionary()
+
+    def _add_over_allocated(self):
+        # Version 1 stores did not mark the people over-allocated.
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.execute("ALTER TABLE nodes ADD COLUMN over_allocated INTEGER NOT NULL DEFAULT 0")
+            marked = []
+            for tree_id, node_id, parent_id, state in self.connection.execute(
+                    "SELECT tree_id, node_id, parent_id, state FROM nodes WHERE parent_id IS NOT NULL"):
+                numbers = json.loads(state)
+                values = [Fraction(numbers[i], numbers[i + 1]) for i in range(0, len(numbers), 2)]
+                if is_over_allocated(parent_id, ("", *values)):
+                    marked.append((tree_id, node_id))
+            self.connection.executemany(
+                "UPDATE nodes SET over_allocated = 1 WHERE tree_id = ? AND node_id = ?", marked)
+            self.connection.execute("PRAGMA user_version = 2")
+
+    def close(self):
+        self.connection.close()
+
+    def tree_names(self):
+        return [name for name, in self.connection.execute("SELECT name FROM trees ORDER BY name")]
+
+    def _tree_id(self, name):
+        row = self.connection.execute("SELECT tree_id FROM trees WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _fetch(self, tree_id, node_id):
+        row = self.connection.execute(
+            "SELECT parent_id FROM nodes WHERE tree_id = ? AND node_id = ?", (tree_id, node_id)).fetchone()
+        if row is None:
+            return []
+        rows = []
+        parent_id = row[0]
+        if parent_id is None:
+            # The hidden root, then the top of the tree.
+            rows.append(self.connection.execute(
+                f"SELECT {COLUMNS} FROM nodes WHERE tree_id = ? AND node_id = ?", (tree_id, node_id)).fetchone())
+            parent_id = node_id
+        parameters = {"tree": tree_id, "parent": parent_id, "limit": FETCH_ROWS}
+        rows += self.connection.execute(CHILDREN, parameters)
+        if len(rows) < FETCH_ROWS:
+            parameters["limit"] = FETCH_ROWS - len(rows)
+            rows += self.connection.execute(DESCENDANTS, parameters)
+        return decode_rows(rows)
+
+    def _fetch_all(self, tree_id):
+        return decode_rows(self.connection.execute(f"SELECT {COLUMNS} FROM nodes WHERE tree_id = ?", (tree_id,)))
+
+    def open(self, name):
+        """Return a ledger for the named tree that reads its nodes from the
+        store as they are needed."""
+        row = self.connection.execute("SELECT tree_id, next_id FROM trees WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise LedgerError(f"No tree named {name} in {self.path}.")
+        tree_id, next_id = row
+        size = self.connection.execute("SELECT COUNT(*) FROM nodes WHERE tree_id = ?", (tree_id,)).fetchone()[0]
+        referrers = {}
+        for node_id, ref in self.connection.execute(
+                "SELECT node_id, ref FROM nodes WHERE tree_id = ? AND ref IS NOT NULL", (tree_id,)):
+            referrers.setdefault(ref, set()).add(node_id)
+        over = [node_id for node_id, in self.connection.execute(
+            "SELECT node_id FROM nodes INDEXED BY nodes_over_allocated WHERE tree_id = ? AND over_allocated", (tree_id,))]
+        ledger = ShareLedger.from_store(
+            lambda node_id: self._fetch(tree_id, node_id),
+            lambda: self._fetch_all(tree_id),
+            size, next_id, referrers, over,
+        )
+        ledger.nodes[ShareLedger.ROOT]
+        self.bound[ledger] = name
+        return ledger
+
+    def save(self, name, ledger):
+        """Save ledger as the named tree in one transaction. Returns the
+        number of rows written or deleted."""
+        unsaved = ledger.take_unsaved()
+        tree_id = self._tree_id(name)
+        full = tree_id is None or self.bound.get(ledger) != name or unsaved is None or REPLACED in unsaved
+        try:
+            with self.connection:
+                if full:
+                    # Everything is read before the old rows go.
+                    stored = list(ledger.stored_rows())
+                    if tree_id is None:
+                        tree_id = self.connection.execute(
+                            "INSERT INTO trees (name, next_id) VALUES (?, 0)", (name,)).lastrowid
+                    else:
+                        self.connection.execute("DELETE FROM nodes WHERE tree_id = ?", (tree_id,))
+                    rows = [encode_row(tree_id, row) for row in stored]
+                    removed = []
+                else:
+                    nodes = ledger.nodes
+                    present = [node_id for node_id in unsaved if node_id in nodes]
+                    removed = [(tree_id, node_id) for node_id in unsaved.difference(present)]
+                    rows = [encode_row(tree_id, row) for row in ledger.stored_rows(present)]
+                    self.connection.executemany("DELETE FROM nodes WHERE tree_id = ? AND node_id = ?", removed)
+                self.connection.executemany(f"INSERT OR REPLACE INTO nodes (tree_id, {COLUMNS}, over_allocated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.connection.execute(
+                    "UPDATE trees SET next_id = ?, saved = ? WHERE tree_id = ?",
+                    (ledger.next_id, time.strftime("%Y-%m-%dT%H:%M:%S%z"), tree_id))
+        except BaseException:
+            # What was not saved is unknown now, so the next save writes
+            # the whole tree.
+            self.bound.pop(ledger, None)
+            raise
+        self.bound[ledger] = name
+        return len(rows) + len(removed)
+
+    def delete(self, name):
+        with self.connection:
+            self.connection.execute("DELETE FROM trees WHERE name = ?", (name,))
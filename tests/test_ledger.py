@@ -0,0 +1,238 @@
+import random
+import unittest
+from fractions import Fraction
+
+from ledger import LedgerError, ShareLedger
+
+
+class IncrementalTotalsTest(unittest.TestCase):
+    """The totals and over-allocated people kept up to date change by
+    change must match what a full pass over the tree finds."""
+
+    def random_changes(self, ledger, rnd, count):
+        for _ in range(count):
+            ids = [item for item, _ in ledger.walk()]
+            op = rnd.random()
+            try:
+                if op < 0.1 or not ids:
+                    ledger.add_original_owner("O", Fraction(1, rnd.choice([2, 3])))
+                elif op < 0.45:
+                    ledger.add_heir(rnd.choice(ids), "H", Fraction(1, rnd.choice([2, 3, 5])))
+                elif op < 0.6:
+                    ledger.edit(rnd.choice(ids), "E", Fraction(rnd.choice([0, 1, 2]), 3))
+                elif op < 0.7:
+                    source = rnd.choice(ids)
+                    if ledger.remainder(source) > 0:
+                        ledger.convey(source, [(rnd.choice(ids), ledger.remainder(source) / 2)])
+                elif op < 0.78:
+                    ledger.delete(rnd.choice(ids))
+                elif op < 0.9 and ledger.can_undo():
+                    ledger.undo()
+                elif ledger.can_redo():
+                    ledger.redo()
+            except LedgerError:
+                pass
+            yield
+
+    def test_totals_match_a_tree_built_afresh(self):
+        rnd = random.Random(7)
+        ledger = ShareLedger()
+        for _ in self.random_changes(ledger, rnd, 300):
+            rebuilt = ShareLedger.from_rows(
+                (node_id, parent_id, name, share, allocated, ref)
+                for node_id, parent_id, _, name, share, allocated, ref in ledger.records())
+            self.assertEqual(ledger.total_share(), rebuilt.total_share())
+            for item, _ in rebuilt.walk():
+                self.assertEqual(ledger.remainder(item), rebuilt.remainder(item))
+
+    def test_over_allocated_people_match_a_full_scan(self):
+        rnd = random.Random(11)
+        ledger = ShareLedger()
+        ledger.over_allocated()
+        for _ in self.random_changes(ledger, rnd, 300):
+            expected = {item for item, _ in ledger.walk() if ledger.nodes[item].over_allocated()}
+            self.assertEqual(ledger.over_allocated(), expected)
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.ledger = ShareLedger()
+        self.owner = self.ledger.add_original_owner("A", Fraction(1))
+        self.heir = self.ledger.add_heir(self.owner, "B", Fraction(1, 2))
+
+    def test_undo_and_redo_step_through_the_changes(self):
+        ledger = self.ledger
+        before = list(ledger.records())
+        ledger.convey(self.owner, [(self.heir, Fraction(1, 4))])
+        ledger.edit(self.heir, "Bea", Fraction(1, 3))
+        after = list(ledger.records())
+
+        ledger.undo()
+        ledger.undo()
+        self.assertEqual(list(ledger.records()), before)
+        self.assertTrue(ledger.can_redo())
+        ledger.redo()
+        ledger.redo()
+        self.assertEqual(list(ledger.records()), after)
+        self.assertFalse(ledger.can_redo())
+
+    def test_a_new_change_drops_what_could_be_redone(self):
+        ledger = self.ledger
+        ledger.delete(self.heir)
+        ledger.undo()
+        ledger.add_heir(self.owner, "C", Fraction(1, 4))
+        self.assertFalse(ledger.can_redo())
+
+    def test_a_failed_change_is_rolled_back(self):
+        ledger = self.ledger
+        grandchild = ledger.add_heir(self.heir, "C", Fraction(1, 2))
+        before = list(ledger.records())
+        version = ledger.version
+        steps = len(ledger.history.undo_stack)
+
+        # The reference node is added before the loop is found.
+        with self.assertRaises(LedgerError):
+            ledger.add_reference(grandchild, self.heir, Fraction(1, 2))
+
+        self.assertEqual(list(ledger.records()), before)
+        self.assertEqual(ledger.referrers, {})
+        self.assertEqual(ledger.version, version)
+        self.assertEqual(len(ledger.history.undo_stack), steps)
+        self.assertEqual(ledger.total_share(), 1)
+
+    def test_only_the_latest_steps_are_kept(self):
+        ledger = ShareLedger(max_undo_steps=2)
+        owner = ledger.add_original_owner("A", Fraction(1))
+        for name in "BCD":
+            ledger.add_heir(owner, name, Fraction(1, 4))
+        ledger.undo()
+        ledger.undo()
+        self.assertFalse(ledger.can_undo())
+        self.assertEqual([name for name, _ in ledger.claimants()], ["A", "B"])
+
+
+class ImportRowsTest(unittest.TestCase):
+    def test_rows_are_added_under_their_parents_as_one_change(self):
+        ledger = ShareLedger()
+        owner = ledger.add_original_owner("A", Fraction(1))
+        ids = ledger.import_rows([
+            (3, "c", "b", "C", "1/2"),
+            (2, "b", owner, "B", "1/2"),
+            (4, "", "", "D", "0"),
+        ])
+
+        self.assertEqual(ledger.parent(ids[0]), ids[1])
+        self.assertEqual(ledger.share(ids[0]), Fraction(1, 4))
+        self.assertTrue(ledger.is_original_owner(ids[2]))
+        ledger.undo()
+        self.assertEqual(len(ledger), 1)
+
+    def test_a_bad_table_is_rejected_with_every_problem_and_nothing_added(self):
+        ledger = ShareLedger()
+        owner = ledger.add_original_owner("A", Fraction(1))
+        ledger.add_heir(owner, "B", Fraction(3, 4))
+        before = list(ledger.records())
+        version = ledger.version
+
+        with self.assertRaises(LedgerError) as caught:
+            ledger.import_rows([
+                (2, "x", "", "X", "one half"),
+                (3, "y", "z", "Y", "1/2"),
+                (4, "z", "y", "Z", "1/2"),
+                (5, "x", "", "", "-1/2"),
+                (6, "", "N99", "W", "1/2"),
+                (7, "", owner, "V", "1/2"),
+            ])
+
+        message = str(caught.exception)
+        for expected in ("Line 2: invalid fraction", "Line 4: Z is listed as their own ancestor",
+                         "Line 5: share cannot be negative", "Line 5: missing name",
+                         "Line 5: duplicate id x", "Line 6: unknown parent N99",
+                         "more than their remaining share"):
+            self.assertIn(expected, message)
+        self.assertEqual(list(ledger.records()), before)
+        self.assertEqual(ledger.version, version)
+
+    def test_unzeroing_one_parent_does_not_leave_another_with_a_stale_base(self):
+        ledger = ShareLedger()
+        a = ledger.add_original_owner("A", Fraction(1))
+        b = ledger.add_heir(a, "B", Fraction(1, 2))
+        c = ledger.add_heir(b, "C", Fraction(1, 2))
+        ledger.edit(b, "B", Fraction(0))
+        d = ledger.add_heir(a, "D", Fraction(1, 2))
+        ledger.convey(d, [(b, Fraction(1, 8))])
+        one_at_a_time = ledger.fork()
+
+        x, y = ledger.import_rows([(2, "", c, "X", "1/2"), (3, "", b, "Y", "1/2")])
+        one_at_a_time.add_heir(c, "X", Fraction(1, 2))
+        one_at_a_time.add_heir(b, "Y", Fraction(1, 2))
+
+        self.assertEqual(ledger.share(x), 0)
+        self.assertEqual(ledger.share(y), Fraction(1, 16))
+        self.assertEqual(ledger.total_share(), 1)
+        self.assertEqual(sorted(ledger.claimants()), sorted(one_at_a_time.claimants()))
+
+
+class ReferenceTest(unittest.TestCase):
+    def setUp(self):
+        self.ledger = ShareLedger()
+        a = self.ledger.add_original_owner("A", Fraction(1))
+        self.p = self.ledger.add_heir(a, "P", Fraction(1, 2))
+        self.q = self.ledger.add_heir(a, "Q", Fraction(1, 2))
+        self.x = self.ledger.add_heir(self.p, "X", Fraction(1, 2))
+
+    def test_what_a_person_inherits_does_not_grow_shares_conveyed_to_their_heirs(self):
+        ledger = self.ledger
+        ledger.add_heir(self.q, "R", Fraction(1, 2))
+        ledger.add_reference(self.q, self.p, Fraction(1, 4))
+        ledger.convey(self.q, [(self.x, ledger.remainder(self.q))])
+
+        claimants = dict(ledger.claimants())
+        # P's estate of 1/2 + 1/8 is split half and half; the 1/8 conveyed
+        # to X from Q's line is X's alone.
+        self.assertEqual(claimants, {"P": Fraction(5, 16), "X": Fraction(7, 16), "R": Fraction(1, 4)})
+        self.assertEqual(sum(claimants.values()), ledger.total_share())
+
+    def test_a_person_with_no_share_of_their_own_keeps_what_they_inherit(self):
+        ledger = self.ledger
+        ledger.add_reference(self.q, self.p, Fraction(1))
+        ledger.edit(self.p, "P", Fraction(0))
+
+        claimants = dict(ledger.claimants())
+        self.assertEqual(claimants["P"], Fraction(1, 2))
+        self.assertEqual(claimants["X"], 0)
+        self.assertEqual(sum(claimants.values()), ledger.total_share())
+
+
+class DiffTest(unittest.TestCase):
+    def test_a_conveyance_into_a_line_with_no_share_is_found(self):
+        ledger = ShareLedger()
+        owner = ledger.add_original_owner("O", Fraction(1))
+        parent = ledger.add_heir(owner, "P", Fraction(1, 2))
+        line = ledger.add_heir(parent, "Z", Fraction(1, 2))
+        heir = ledger.add_heir(line, "H", Fraction(1, 2))
+        ledger.edit(line, "Z", Fraction(0))
+        ledger.subtree_hash()
+        old = ledger.fork()
+
+        ledger.convey(owner, [(heir, Fraction(1, 16))])
+
+        self.assertEqual(ledger.diff(old).claimants, [("H", Fraction(1, 16)), ("O", Fraction(-1, 16))])
+
+    def test_a_tree_hashes_the_same_after_a_reload(self):
+        ledger = ShareLedger()
+        owner = ledger.add_original_owner("O", Fraction(1))
+        line = ledger.add_heir(owner, "Z", Fraction(1, 2))
+        heir = ledger.add_heir(line, "H", Fraction(1, 2))
+        ledger.add_heir(heir, "G", Fraction(1, 3))
+        ledger.edit(line, "Z", Fraction(0))
+        reloaded = ShareLedger.from_rows(
+            (node_id, parent_id, name, share, allocated, ref)
+            for node_id, parent_id, _, name, share, allocated, ref in ledger.records())
+
+        self.assertEqual(reloaded.subtree_hash(), ledger.subtree_hash())
+        self.assertFalse(reloaded.diff(ledger))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+
+from service import INVALID_PARAMS, ServiceClient, ServiceError, TreeService, start_server
+from storage import load_ledger
+
+
+class ServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.server = await start_server(TreeService(self.root), port=0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.client = await ServiceClient.connect(port=port)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_a_tree_can_be_built_reported_undone_and_saved(self):
+        call = self.client.call
+        created = await call("create", tree="north.vest")
+        self.assertEqual(created["people"], 0)
+        owner = (await call("add_owner", tree="north.vest", name="Ann", share="1"))["id"]
+        ben = (await call("add_heir", tree="north.vest", parent=owner, name="Ben", fraction="1/2"))["id"]
+        cal = (await call("add_heir", tree="north.vest", parent=owner, name="Cal", fraction="1/2"))["id"]
+        await call("convey", tree="north.vest", source=ben, recipients=[[cal, "1/2"]])
+
+        report = await call("report", tree="north.vest")
+        self.assertEqual({row["name"]: row["share"] for row in report["claimants"]}, {"Ben": "1/4", "Cal": "3/4"})
+        self.assertEqual(report["total_share"], "1")
+
+        await call("undo", tree="north.vest")
+        report = await call("report", tree="north.vest")
+        self.assertEqual({row["name"]: row["share"] for row in report["claimants"]}, {"Ben": "1/2", "Cal": "1/2"})
+
+        saved = await call("save", tree="north.vest")
+        self.assertTrue(saved["saved"])
+        self.assertEqual(saved["path"], os.path.join(self.root, "north.vest"))
+        ledger = load_ledger(saved["path"])
+        self.assertEqual(sorted(ledger.claimants()), [("Ben", Fraction(1, 2)), ("Cal", Fraction(1, 2))])
+
+    async def test_an_heir_with_a_fraction_of_0_is_refused(self):
+        await self.client.call("create", tree="north.json")
+        owner = (await self.client.call("add_owner", tree="north.json", name="Ann", share="1"))["id"]
+        with self.assertRaises(ServiceError) as caught:
+            await self.client.call("add_heir", tree="north.json", parent=owner, name="Ben", fraction="0")
+        self.assertEqual(caught.exception.code, INVALID_PARAMS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+
+from ledger import ShareLedger
+from storage import load_ledger, pack_ledger, save_ledger, unpack_ledger
+
+
+class NodeIdTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def reload(self, ledger, extension):
+        path = os.path.join(self.directory.name, "tree" + extension)
+        save_ledger(path, list(ledger.records()), next_id=ledger.next_id)
+        return load_ledger(path)
+
+    def test_a_reloaded_tree_does_not_reuse_a_deleted_id(self):
+        for extension in (".vest", ".json"):
+            with self.subTest(extension=extension):
+                ledger = ShareLedger()
+                a = ledger.add_original_owner("A", Fraction(1))
+                ledger.add_heir(a, "J", Fraction(1, 2))
+                k = ledger.add_heir(a, "K", Fraction(1, 2))
+                ledger = self.reload(ledger, extension)
+                ledger.delete(k)
+                old = self.reload(ledger, extension)
+                new = old.fork()
+                zed = new.add_heir(a, "Zed", Fraction(1, 2))
+
+                self.assertNotEqual(zed, k)
+                changes = new.diff(old)
+                self.assertEqual([item[2] for item in changes.added], ["Zed"])
+                self.assertEqual(changes.changed, [])
+
+    def test_a_packed_tree_and_its_fork_never_hand_out_the_same_id(self):
+        ledger = ShareLedger()
+        a = ledger.add_original_owner("A", Fraction(1))
+        scenario = ledger.fork()
+        counter = ledger.id_counter
+        packed = pack_ledger(ledger)
+        heir = scenario.add_heir(a, "Scenario heir", Fraction(1, 2))
+
+        restored = unpack_ledger(packed)
+        restored.use_ids(counter)
+        real = restored.add_heir(a, "Real heir", Fraction(1, 2))
+
+        self.assertNotEqual(real, heir)
+        self.assertEqual(scenario.diff(restored).changed, [])
+
+
+class ForkIdTest(unittest.TestCase):
+    def test_a_fork_and_its_original_never_hand_out_the_same_id(self):
+        ledger = ShareLedger()
+        a = ledger.add_original_owner("A", Fraction(1))
+        other = ledger.fork()
+
+        self.assertNotEqual(ledger.add_heir(a, "B", Fraction(1, 2)), other.add_heir(a, "C", Fraction(1, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+
+from ledger import ShareLedger
+from store import FETCH_ROWS, TreeStore
+
+
+def sample_tree(size=200):
+    ledger = ShareLedger()
+    parents = [ledger.add_original_owner("A", Fraction(1, 2)), ledger.add_original_owner("B", Fraction(1, 2))]
+    for i in range(size):
+        parent = parents[i // 3]
+        parents.append(ledger.add_heir(parent, f"H{i}", Fraction(1, 4)))
+    return ledger
+
+
+class TreeStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "tracts.vestdb")
+
+    def reopen(self, store):
+        store.close()
+        store = TreeStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def test_a_tree_reopens_as_it_was_saved_reading_branches_as_needed(self):
+        ledger = sample_tree(FETCH_ROWS * 3)
+        store = TreeStore(self.path)
+        self.assertEqual(store.save("north", ledger), len(ledger) + 1)
+
+        store = self.reopen(store)
+        self.assertEqual(store.tree_names(), ["north"])
+        opened = store.open("north")
+        self.assertLess(dict.__len__(opened.nodes), len(ledger))
+        self.assertEqual(len(opened), len(ledger))
+        self.assertEqual(opened.next_id, ledger.next_id)
+        self.assertEqual(list(opened.records()), list(ledger.records()))
+
+    def test_saving_again_writes_only_what_changed(self):
+        store = TreeStore(self.path)
+        store.save("north", sample_tree())
+        store = self.reopen(store)
+        ledger = store.open("north")
+        heir = ledger.children(ledger.original_owners()[0])[1]
+        leaf = ledger.add_heir(heir, "New", Fraction(1, 8))
+        ledger.delete(ledger.children(heir)[0])
+
+        written = store.save("north", ledger)
+
+        self.assertLess(written, len(ledger) // 10)
+        store = self.reopen(store)
+        opened = store.open("north")
+        self.assertEqual(list(opened.records()), list(ledger.records()))
+        self.assertEqual(opened.name(leaf), "New")
+        self.assertEqual(opened.claimants(), ledger.claimants())
+
+
+if __name__ == "__main__":
+    unittest.main()